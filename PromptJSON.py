@@ -1,12 +1,76 @@
+import collections
+import concurrent.futures
+import functools
+import hashlib
+import importlib.machinery
+import itertools
 import json
 import logging
+import multiprocessing
+import os
+import re
+from .caching import LRUCache, content_hash, freeze
+from .compiled_schema import CompiledSchema
+from .config import env_number
+from .grammar import schema_grammars
+from .metrics import metrics
 from .prompt_templates import PromptTemplates
+from .template_registry import registry
+from .token_counting import count_tokens, tokenizer_names
+
+logger = logging.getLogger(__name__)
+
+LAYOUTS = ["Standard", "Prefix-Optimized"]
+SCHEMA_FORMATS = ["Pretty", "Minified", "TypeScript", "Deduplicated"]
+EXAMPLE_SELECTIONS = ["Fixed Tiers", "Nearest Complexity"]
+
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z_$][\w$]*$")
+_INDEX_RE = re.compile(r"\[\d+\]")
+_APPROPRIATE_RE = re.compile(r"\[appropriate ([^\]]+)\]")
+
+
+def _build_chunk(records, complexity, llm_prompt_type, schema_type, enhance_prompt, custom_schema, layout, schema_format,
+                 example_selection):
+    return list(PromptJSON().iter_batch(records, complexity, llm_prompt_type, schema_type, enhance_prompt, custom_schema, layout,
+                                        schema_format, example_selection))
+
+
+def processes_usable():
+    # Worker processes unpickle _build_chunk by module name. With fork they inherit the loaded package; with
+    # spawn (Windows, macOS) they must import it, which fails when ComfyUI loaded the package from a file path.
+    if (multiprocessing.get_start_method(allow_none=True) or multiprocessing.get_all_start_methods()[0]) == "fork":
+        return True
+    package = __name__.rpartition(".")[0]
+    if not package.isidentifier():
+        return False
+    # Search sys.path, as a spawned worker would, rather than sys.modules
+    spec = importlib.machinery.PathFinder.find_spec(package)
+    return spec is not None and spec.origin == os.path.join(os.path.dirname(os.path.abspath(__file__)), "__init__.py")
 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class PromptJSON:
+    # Compiled schemas (rendered text plus placeholder layout) keyed by (schema_type, content hash of custom_schema, schema_format)
+    rendered_schema_cache = LRUCache(maxsize=64)
+    # Parsed, frozen schemas keyed by (schema_type, content hash of custom_schema)
+    parsed_schema_cache = LRUCache(maxsize=env_number("PROMPTJSON_PARSE_CACHE_SIZE", 128))
+    # Parse errors of the invalid custom schemas in parsed_schema_cache, so cached fallbacks are reported on every use
+    schema_errors = LRUCache(maxsize=parsed_schema_cache.maxsize)
+    # (JSON Schema, GBNF grammar) text keyed by (schema_type, content hash of custom_schema)
+    grammar_cache = LRUCache(maxsize=64)
+    # Guards for user-supplied schemas; anything larger falls back to the default schema
+    MAX_SCHEMA_DEPTH = env_number("PROMPTJSON_MAX_SCHEMA_DEPTH", 200)
+    MAX_SCHEMA_NODES = env_number("PROMPTJSON_MAX_SCHEMA_NODES", 1000000)
+
     def __init__(self):
-        logging.info("Initializing PromptJSON")
+        logger.debug("Initializing %s", type(self).__name__)
+
+    @classmethod
+    def clear_caches(cls):
+        cls.rendered_schema_cache.clear()
+        cls.parsed_schema_cache.clear()
+        cls.schema_errors.clear()
+        cls.grammar_cache.clear()
+        PromptTemplates.cache_clear()
 
     @classmethod
     def INPUT_TYPES(cls):
@@ -15,67 +79,279 @@ class PromptJSON:
                 "prompt": ("STRING", {"multiline": True}),
                 "negative_prompt": ("STRING", {"multiline": True}),
                 "complexity": ("FLOAT", {"default": 0.5, "min": 0.1, "max": 1.0, "step": 0.1}),
-                "llm_prompt_type": (["One Shot", "Few Shot"],),
-                "schema_type": (["JSON", "HTML", "Key", "Attribute-Based", "Visual Layer Breakdown", "Compositional Grid", "Artistic Reference"],),
+                "llm_prompt_type": (PromptTemplates.LLM_PROMPT_TYPES,),
+                "schema_type": (PromptTemplates.schema_types(),),
                 "enhance_prompt": ("BOOLEAN", {"default": False}),
             },
             "optional": {
                 "custom_schema": ("STRING", {"multiline": True}),
+                "max_tokens": ("INT", {"default": 0, "min": 0, "max": 1048576}),
+                "tokenizer": (tokenizer_names(),),
+                "layout": (LAYOUTS,),
+                "schema_format": (SCHEMA_FORMATS,),
+                "example_selection": (EXAMPLE_SELECTIONS,),
             }
         }
 
-    RETURN_TYPES = ("STRING", "STRING", "STRING", "STRING")
-    RETURN_NAMES = ("system_prompt", "user_prompt", "negative_passthru", "schema")
+    @classmethod
+    def IS_CHANGED(cls, prompt, negative_prompt, complexity, llm_prompt_type, schema_type, enhance_prompt, custom_schema="",
+                   max_tokens=0, tokenizer="estimate", layout="Standard", schema_format="Pretty", example_selection="Fixed Tiers"):
+        return cls.fingerprint(prompt, negative_prompt, complexity, llm_prompt_type, schema_type, enhance_prompt, custom_schema,
+                               max_tokens, tokenizer, layout, schema_format, example_selection)
+
+    @classmethod
+    def fingerprint(cls, prompt, negative_prompt, complexity, llm_prompt_type, schema_type, enhance_prompt, custom_schema="",
+                    max_tokens=0, tokenizer="estimate", layout="Standard", schema_format="Pretty", example_selection="Fixed Tiers"):
+        payload = json.dumps([
+            PromptTemplates.template_version(),
+            prompt,
+            negative_prompt,
+            round(float(complexity), 6),
+            llm_prompt_type,
+            schema_type,
+            bool(enhance_prompt),
+            custom_schema or "",
+            int(max_tokens or 0),
+            tokenizer,
+            layout,
+            schema_format,
+            example_selection,
+        ], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    RETURN_TYPES = ("STRING", "STRING", "STRING", "STRING", "STRING", "STRING", "STRING", "STRING")
+    RETURN_NAMES = ("system_prompt", "user_prompt", "negative_passthru", "schema", "token_counts", "prefix_hash", "json_schema",
+                    "grammar")
     FUNCTION = "process"
     CATEGORY = "prompt_converters"
 
-    def process(self, prompt, negative_prompt, complexity, llm_prompt_type, schema_type, enhance_prompt, custom_schema=""):
-        logging.info(f"Starting process method with schema_type: {schema_type}, enhance_prompt: {enhance_prompt}")
-        
-        system_prompt = self.generate_system_prompt(llm_prompt_type, schema_type, enhance_prompt)
-        schema = self.parse_custom_schema(custom_schema, schema_type)
-        user_prompt = self.generate_user_prompt(prompt, negative_prompt, schema, complexity, schema_type, enhance_prompt)
-        
-        return (system_prompt, user_prompt, negative_prompt, self.format_schema_for_llm(schema, schema_type))
-
-    def generate_system_prompt(self, llm_prompt_type, schema_type, enhance_prompt):
-        base_prompt = PromptTemplates.get_system_prompt(schema_type)
-        
-        if enhance_prompt:
-            base_prompt += "\nYou are encouraged to create additional details not explicitly mentioned in the original prompt, while maintaining consistency with the given information. Use the complexity value to determine the level of detail and elaboration in your response."
+    def process(self, prompt, negative_prompt, complexity, llm_prompt_type, schema_type, enhance_prompt, custom_schema="",
+                max_tokens=0, tokenizer="estimate", layout="Standard", schema_format="Pretty", example_selection="Fixed Tiers"):
+        logger.debug("Starting process method with schema_type: %s, enhance_prompt: %s", schema_type, enhance_prompt)
+        PromptTemplates.refresh()
+
+        formatted_schema = self.render_schema(custom_schema, schema_type, schema_format)
+        with metrics.stage("user_prompt"):
+            head, middle, tail = self.user_prompt_parts(complexity, schema_type, enhance_prompt, formatted_schema, layout)
+            user_prompt = f"{head}{prompt}{middle}{negative_prompt}{tail}"
+            user_tokens = count_tokens(user_prompt, tokenizer)
+        with metrics.stage("system_prompt"):
+            tiers = self.select_example_tiers(llm_prompt_type, schema_type, complexity, example_selection)
+            system_prompt, examples = self.fit_system_prompt(llm_prompt_type, schema_type, enhance_prompt,
+                                                             max_tokens - user_tokens if max_tokens else None, tokenizer, tiers,
+                                                             complexity)
+            system_tokens = count_tokens(system_prompt, tokenizer)
+        token_counts = {
+            "system_prompt": system_tokens,
+            "user_prompt": user_tokens,
+            "total": system_tokens + user_tokens,
+            "max_tokens": max_tokens,
+            "examples": list(examples),
+            "tokenizer": tokenizer,
+        }
+        if max_tokens and token_counts["total"] > max_tokens:
+            logger.warning("Prompt needs %d tokens even without examples, over max_tokens=%d", token_counts["total"], max_tokens)
+            metrics.increment("token_budget_exceeded")
+
+        if metrics.active:
+            metrics.increment("executions")
+            metrics.observe("system_prompt", len(system_prompt))
+            metrics.observe("user_prompt", len(user_prompt))
+            metrics.observe("schema", len(formatted_schema))
+            metrics.maybe_dump()
+        return (system_prompt, user_prompt, negative_prompt, formatted_schema, json.dumps(token_counts),
+                self.prefix_hash(system_prompt, head)) + self.schema_grammars(custom_schema, schema_type)
+
+    def prefix_hash(self, system_prompt, user_prefix):
+        # Identifies the shared prompt prefix (system prompt plus the static start of the user prompt)
+        # so downstream LLM nodes can key a prefix/KV cache on it
+        digest = hashlib.sha256(system_prompt.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(user_prefix.encode("utf-8"))
+        return digest.hexdigest()
+
+    def select_example_tiers(self, llm_prompt_type, schema_type, complexity, example_selection="Fixed Tiers"):
+        # None means the fixed tiers for llm_prompt_type; "Nearest Complexity" picks as many examples
+        # from the example bank, closest to the requested complexity
+        if example_selection != "Nearest Complexity":
+            return None
+        tiers = PromptTemplates.EXAMPLE_TIERS.get(llm_prompt_type, PromptTemplates.EXAMPLE_TIERS["Few Shot"])
+        return PromptTemplates.nearest_tiers(schema_type, complexity, len(tiers))
+
+    def fit_system_prompt(self, llm_prompt_type, schema_type, enhance_prompt, budget=None, tokenizer="estimate", tiers=None,
+                          complexity=None):
+        # Returns the richest system prompt whose token count fits `budget`, dropping the largest examples
+        # first, or with selected tiers and a complexity, the ones farthest from it; (system_prompt, example tiers used).
+        selected = tiers
+        if tiers is None:
+            tiers = PromptTemplates.EXAMPLE_TIERS.get(llm_prompt_type, PromptTemplates.EXAMPLE_TIERS["Few Shot"])
+        if budget is None:
+            return self.generate_system_prompt(llm_prompt_type, schema_type, enhance_prompt, selected), tiers
+        candidates = [tiers]
+        if selected is not None:
+            # Selected tiers are in ascending complexity, so without a complexity the most detailed example goes
+            # first. Otherwise the farthest goes first; on a tie the more detailed one, as in nearest_tiers.
+            ranked = list(tiers)
+            if complexity is not None:
+                complexities, names = PromptTemplates.example_bank(schema_type)
+                level = dict(zip(names, complexities))
+                target = round(float(complexity), 1)
+                ranked.sort(key=lambda tier: (abs(level.get(tier, 0.0) - target), level.get(tier, 0.0)))
+            candidates += [tuple(tier for tier in tiers if tier in ranked[:count]) for count in range(len(tiers) - 1, 0, -1)]
+        elif llm_prompt_type == "Few Shot":
+            candidates += [("low", "medium"), ("medium",), ("low",)]
         else:
-            base_prompt += "\nStrictly use only the information provided in the original prompt. Do not add any details or elements not explicitly mentioned."
-
-        if llm_prompt_type == "One Shot":
-            example = PromptTemplates.get_example_prompt(schema_type, "medium")
-            return f"{base_prompt}\n\nHere's an example of how to structure your response:\n\n{example}"
-        else:  # Few Shot
-            examples = [
-                PromptTemplates.get_example_prompt(schema_type, "low"),
-                PromptTemplates.get_example_prompt(schema_type, "medium"),
-                PromptTemplates.get_example_prompt(schema_type, "high")
-            ]
-        return f"{base_prompt}\n\nHere are a few examples of how to structure your response for different complexity levels:\n\n" + "\n\n".join(examples)
-
-    def parse_custom_schema(self, custom_schema, schema_type):
+            candidates += [("low",)]
+        candidates.append(())
+        for candidate in candidates:
+            system_prompt = PromptTemplates.build_system_prompt(schema_type, llm_prompt_type, bool(enhance_prompt), candidate)
+            if count_tokens(system_prompt, tokenizer) <= budget:
+                return system_prompt, candidate
+        return system_prompt, ()
+
+    def iter_batch(self, records, complexity, llm_prompt_type, schema_type, enhance_prompt, custom_schema="", layout="Standard",
+                   schema_format="Pretty", example_selection="Fixed Tiers"):
+        # records: dicts with "prompt" and optional "negative_prompt", "complexity" and "custom_schema" overrides.
+        # Yields one (system_prompt, user_prompt, negative_passthru, schema) tuple per record.
+        PromptTemplates.refresh()
+        system_prompt = self.generate_system_prompt(llm_prompt_type, schema_type, enhance_prompt)
+        per_complexity = enhance_prompt or example_selection == "Nearest Complexity"
+        parts_by_key = {}
+        for record in records:
+            record_complexity = record.get("complexity", complexity)
+            record_schema = record.get("custom_schema") or custom_schema
+            negative_prompt = record.get("negative_prompt", "")
+            key = (record_complexity if per_complexity else None, record_schema)
+            entry = parts_by_key.get(key)
+            if entry is None:
+                if len(parts_by_key) >= 64:
+                    parts_by_key.clear()
+                formatted_schema = self.render_schema(record_schema, schema_type, schema_format)
+                tiers = self.select_example_tiers(llm_prompt_type, schema_type, record_complexity, example_selection)
+                entry = (self.generate_system_prompt(llm_prompt_type, schema_type, enhance_prompt, tiers) if tiers is not None
+                         else system_prompt, formatted_schema,
+                         self.user_prompt_parts(record_complexity, schema_type, enhance_prompt, formatted_schema, layout))
+                parts_by_key[key] = entry
+            system_prompt, formatted_schema, (head, middle, tail) = entry
+            yield (system_prompt, f"{head}{record['prompt']}{middle}{negative_prompt}{tail}", negative_prompt, formatted_schema)
+
+    @classmethod
+    def build_many(cls, records, complexity=0.5, llm_prompt_type="One Shot", schema_type="JSON", enhance_prompt=False,
+                   custom_schema="", workers=None, use_processes=False, chunksize=256, max_pending=None, layout="Standard",
+                   schema_format="Pretty", example_selection="Fixed Tiers"):
+        # Same output as iter_batch, fanned out over a thread (or, with use_processes, process) pool in chunks of
+        # `chunksize`. Results are yielded in input order; at most `max_pending` chunks are in flight, so `records`
+        # is consumed lazily and memory stays bounded. Processes fall back to threads where workers could not
+        # import this package (see processes_usable).
+        workers = workers or os.cpu_count() or 1
+        if workers <= 1:
+            yield from cls().iter_batch(records, complexity, llm_prompt_type, schema_type, enhance_prompt, custom_schema, layout,
+                                        schema_format, example_selection)
+            return
+
+        max_pending = max_pending or workers * 2
+        if use_processes and not processes_usable():
+            logger.warning("Worker processes cannot import this package here; using threads instead")
+            use_processes = False
+        executor_cls = concurrent.futures.ProcessPoolExecutor if use_processes else concurrent.futures.ThreadPoolExecutor
+        records = iter(records)
+        with executor_cls(max_workers=workers) as executor:
+            pending = collections.deque()
+            while True:
+                while len(pending) < max_pending:
+                    chunk = list(itertools.islice(records, chunksize))
+                    if not chunk:
+                        break
+                    pending.append(executor.submit(_build_chunk, chunk, complexity, llm_prompt_type, schema_type,
+                                                   enhance_prompt, custom_schema, layout, schema_format, example_selection))
+                if not pending:
+                    break
+                yield from pending.popleft().result()
+
+    def render_schema(self, custom_schema, schema_type, schema_format="Pretty"):
+        text = self.compile_schema(custom_schema, schema_type, schema_format).text
+        self.report_schema_error(custom_schema, schema_type)
+        return text
+
+    def compile_schema(self, custom_schema, schema_type, schema_format="Pretty"):
+        key = (schema_type, content_hash(custom_schema), schema_format)
+        compiled = self.rendered_schema_cache.get(key)
+        if compiled is None:
+            schema = self.parse_custom_schema(custom_schema, schema_type, report=False)
+            with metrics.stage("schema_format"):
+                compiled = CompiledSchema(schema, PromptTemplates.render_kind(schema_type), schema_format,
+                                          self.format_schema_for_llm(schema, schema_type, schema_format),
+                                          functools.partial(self.format_schema_for_llm, schema_type=schema_type,
+                                                            schema_format=schema_format))
+            self.rendered_schema_cache.put(key, compiled)
+        return compiled
+
+    def schema_grammars(self, custom_schema, schema_type):
+        # (JSON Schema text, llama.cpp GBNF grammar) constraining responses to the active schema
+        key = (schema_type, content_hash(custom_schema))
+        grammars = self.grammar_cache.get(key)
+        if grammars is None:
+            schema = self.parse_custom_schema(custom_schema, schema_type, report=False)
+            kind = PromptTemplates.render_kind(schema_type)
+            leaf_parts = () if isinstance(schema, dict) else self.compile_schema(custom_schema, schema_type).leaf_parts
+            try:
+                with metrics.stage("grammar"):
+                    json_schema, gbnf = schema_grammars(kind, schema, leaf_parts)
+                json_schema = {"$schema": "https://json-schema.org/draft/2020-12/schema", "title": schema_type, **json_schema}
+                grammars = (json.dumps(json_schema, ensure_ascii=False), gbnf)
+            except (RecursionError, ValueError, TypeError) as e:
+                # Grammars are optional outputs; never fail the prompt over them
+                logger.error("Could not build grammars for %s schema: %s", schema_type, e)
+                grammars = ("", "")
+            self.grammar_cache.put(key, grammars)
+        return grammars
+
+    def generate_system_prompt(self, llm_prompt_type, schema_type, enhance_prompt, tiers=None):
+        if tiers is None:
+            return PromptTemplates.build_system_prompt(schema_type, llm_prompt_type, bool(enhance_prompt))
+        return PromptTemplates.build_system_prompt(schema_type, llm_prompt_type, bool(enhance_prompt), tuple(tiers))
+
+    def parse_custom_schema(self, custom_schema, schema_type, report=True):
+        # Invalid schemas fall back to the default schema; with report, the parse error is logged and counted
+        # on every call, including cached ones
+        key = (schema_type, content_hash(custom_schema))
+        schema = self.parsed_schema_cache.get(key)
+        if schema is None:
+            with metrics.stage("schema_parse"):
+                schema = self.parsed_schema_cache.put(key, freeze(self._parse_custom_schema(custom_schema, schema_type, key)))
+        if report:
+            self.report_schema_error(custom_schema, schema_type)
+        return schema
+
+    def report_schema_error(self, custom_schema, schema_type):
+        if not custom_schema or not self.schema_errors.info().currsize:
+            return
+        error = self.schema_errors.get((schema_type, content_hash(custom_schema)))
+        if error is not None:
+            logger.error("Invalid custom schema: %s", error)
+            metrics.increment("schema_parse_failures")
+
+    def _parse_custom_schema(self, custom_schema, schema_type, key=None):
         if not custom_schema:
             return PromptTemplates.get_default_schema(schema_type)
+        kind = PromptTemplates.render_kind(schema_type)
         try:
-            if schema_type in ["JSON", "Visual Layer Breakdown", "Compositional Grid", "Artistic Reference"]:
+            if kind == "JSON":
                 schema = json.loads(custom_schema)
                 if not isinstance(schema, dict):
                     raise ValueError(f"Custom {schema_type} schema must be a JSON object")
-            elif schema_type == "HTML":
+                self.check_schema_limits(schema)
+            elif kind == "HTML":
                 schema = self.parse_html_schema(custom_schema)
-            elif schema_type == "Key":
+            elif kind == "Key":
                 schema = self.parse_key_schema(custom_schema)
-            elif schema_type == "Attribute-Based":
+            elif kind == "Attribute-Based":
                 schema = custom_schema.strip().split('\n')
             else:
                 raise ValueError(f"Unsupported schema type: {schema_type}")
             return schema
         except Exception as e:
-            logging.error(f"Invalid custom schema: {str(e)}")
+            self.schema_errors.put(key or (schema_type, content_hash(custom_schema)), str(e))
             return PromptTemplates.get_default_schema(schema_type)
 
     def parse_html_schema(self, custom_schema):
@@ -88,9 +364,15 @@ class PromptJSON:
             return custom_schema.strip()
         return PromptTemplates.get_default_schema("Key")
 
-    def generate_user_prompt(self, prompt, negative_prompt, schema, complexity, schema_type, enhance_prompt):
-        formatted_schema = self.format_schema_for_llm(schema, schema_type)
-    
+    def generate_user_prompt(self, prompt, negative_prompt, schema, complexity, schema_type, enhance_prompt, formatted_schema=None,
+                             layout="Standard"):
+        if formatted_schema is None:
+            formatted_schema = self.format_schema_for_llm(schema, schema_type)
+        head, middle, tail = self.user_prompt_parts(complexity, schema_type, enhance_prompt, formatted_schema, layout)
+        return f"{head}{prompt}{middle}{negative_prompt}{tail}"
+
+    def user_prompt_parts(self, complexity, schema_type, enhance_prompt, formatted_schema, layout="Standard"):
+        # Static text around the per-request prompt/negative_prompt slots, so batches only interpolate those
         enhancement_instruction = ""
         if enhance_prompt:
             enhancement_instruction = f"""
@@ -101,9 +383,24 @@ Higher complexity should result in more detailed and nuanced descriptions.
         else:
             enhancement_instruction = "Strictly use only the information provided in the original prompt. Do not add any details or elements not explicitly mentioned."
 
-        return f"""Generate a detailed image description based on the following prompt: "{prompt}"
+        if layout == "Prefix-Optimized":
+            # Everything that only depends on the schema goes first so it is byte-identical across requests
+            # and can be served from an LLM server's prefix/KV cache; per-request values come last.
+            head = f"""Use the following {schema_type} schema to structure your response. Replace the placeholders with appropriate, detailed content:
+{formatted_schema}
+
+Ensure that your response adheres strictly to this schema, providing detailed and creative content for each field. Make sure to avoid including any elements mentioned in the negative prompt.
+
+Your response should be a valid {schema_type} structure that follows the provided schema.
+
+Generate a detailed image description based on the following prompt: \""""
+            middle = '"\n\nNegative prompt (elements to avoid): "'
+            tail = f'"\n\n{enhancement_instruction.strip()}'
+            return head, middle, tail
 
-Negative prompt (elements to avoid): "{negative_prompt}"
+        head = 'Generate a detailed image description based on the following prompt: "'
+        middle = '"\n\nNegative prompt (elements to avoid): "'
+        tail = f""""
 
 {enhancement_instruction}
 
@@ -113,21 +410,103 @@ Use the following {schema_type} schema to structure your response. Replace the p
 Ensure that your response adheres strictly to this schema, providing detailed and creative content for each field. Make sure to avoid including any elements mentioned in the negative prompt.
 
 Your response should be a valid {schema_type} structure that follows the provided schema."""
+        return head, middle, tail
 
-    def format_schema_for_llm(self, schema, schema_type):
-        if schema_type == "JSON":
+    def format_schema_for_llm(self, schema, schema_type, schema_format="Pretty"):
+        if schema_format != "Pretty":
+            compact = self.format_compact_schema(schema, schema_type, schema_format)
+            if compact is not None:
+                return compact
+        kind = PromptTemplates.render_kind(schema_type)
+        if kind == "JSON":
             return json.dumps(schema, indent=2)
-        elif schema_type == "HTML":
+        elif kind == "HTML":
             return self.format_html_schema_for_llm(schema)
-        elif schema_type == "Key":
+        elif kind == "Key":
             return self.format_key_schema_for_llm(schema)
-        elif schema_type == "Attribute-Based":
+        elif kind == "Attribute-Based":
             return "\n".join(schema)
-        elif schema_type in ["Visual Layer Breakdown", "Compositional Grid", "Artistic Reference"]:
-            return json.dumps(schema, indent=2)
         else:
             raise ValueError(f"Unsupported schema type: {schema_type}")
 
+    def format_compact_schema(self, schema, schema_type, schema_format):
+        # Smaller renderings of the schema; returns None where a format has nothing to save for this schema type:
+        # TypeScript is JSON-only, Key lines have no whitespace for Minified to drop, and Attribute-Based has neither
+        kind = PromptTemplates.render_kind(schema_type)
+        if kind == "JSON":
+            if schema_format == "Minified":
+                return json.dumps(schema, separators=(",", ":"), ensure_ascii=False)
+            if schema_format == "TypeScript":
+                return self._format_typescript(self._dedupe_lists(schema))[0]
+            if schema_format == "Deduplicated":
+                return json.dumps(self._dedupe_lists(schema), separators=(",", ":"), ensure_ascii=False)
+        elif kind == "HTML":
+            if schema_format == "Deduplicated" and not isinstance(schema, str):
+                schema = self._format_html_dict(self._dedupe_lists(schema))
+            if schema_format in ("Minified", "Deduplicated"):
+                formatted = schema if isinstance(schema, str) else self._format_html_dict(schema)
+                return "\n".join(line.strip() for line in formatted.splitlines() if line.strip())
+        elif kind == "Key":
+            if schema_format == "Deduplicated":
+                return self._dedupe_key_lines(self.format_key_schema_for_llm(schema))
+        return None
+
+    def _dedupe_lists(self, value):
+        # Collapse repeated list items into a single representative item
+        if isinstance(value, dict):
+            return {key: self._dedupe_lists(item) for key, item in value.items()}
+        if isinstance(value, list):
+            if value and all(isinstance(item, dict) for item in value):
+                merged = {}
+                for item in value:
+                    for key, child in item.items():
+                        merged.setdefault(key, child)
+                return [self._dedupe_lists(merged)]
+            return [self._dedupe_lists(value[0])] if value else []
+        return value
+
+    def _dedupe_key_lines(self, text):
+        # "a[0].b: ..." / "a[1].b: ..." -> a single "a[0].b: ...", and "[appropriate b]" -> "[b]". Indexes stay
+        # numeric so responses that copy the paths still parse.
+        seen = set()
+        lines = []
+        for line in text.splitlines():
+            path, sep, value = line.partition(":")
+            path = _INDEX_RE.sub("[0]", path)
+            if path in seen:
+                continue
+            seen.add(path)
+            lines.append(path + sep + _APPROPRIATE_RE.sub(r"[\1]", value))
+        return "\n".join(lines)
+
+    def _format_typescript(self, value, indent=""):
+        # Returns (type expression, description); descriptions of leaves become trailing comments
+        if isinstance(value, dict):
+            inner = indent + "  "
+            lines = ["{"]
+            for key, item in value.items():
+                name = key if _IDENTIFIER_RE.match(key) else json.dumps(key)
+                type_expr, description = self._format_typescript(item, inner)
+                comment = f" // {description}" if description else ""
+                lines.append(f"{inner}{name}: {type_expr};{comment}")
+            lines.append(f"{indent}}}")
+            return "\n".join(lines), None
+        if isinstance(value, list):
+            if not value:
+                return "unknown[]", None
+            type_expr, description = self._format_typescript(value[0], indent)
+            return f"{type_expr}[]", description
+        if isinstance(value, bool):
+            return "boolean", None
+        if isinstance(value, (int, float)):
+            return "number", None
+        if value is None:
+            return "null", None
+        text = str(value).strip()
+        if text in ("string", "number", "boolean"):
+            return text, None
+        return "string", text[1:-1].strip() if text.startswith("[") and text.endswith("]") else text
+
     def format_html_schema_for_llm(self, schema):
         if isinstance(schema, str):
             return schema
@@ -135,23 +514,44 @@ Your response should be a valid {schema_type} structure that follows the provide
         return self._format_html_dict(schema)
 
     def _format_html_dict(self, schema, indent=""):
-        result = []
-        for key, value in schema.items():
-            if isinstance(value, dict):
-                result.append(f"{indent}<{key}>")
-                result.append(self._format_html_dict(value, indent + "  "))
-                result.append(f"{indent}</{key}>")
-            elif isinstance(value, list):
-                for item in value:
-                    if isinstance(item, dict):
-                        result.append(f"{indent}<{key}>")
-                        result.append(self._format_html_dict(item, indent + "  "))
-                        result.append(f"{indent}</{key}>")
-                    else:
-                        result.append(f"{indent}<{key}>[appropriate {key}]</{key}>")
+        return "\n".join(self.iter_html_schema_lines(schema, indent))
+
+    def iter_html_schema_lines(self, schema, indent=""):
+        # Yields the lines of the HTML rendering one at a time, walking the schema with an explicit
+        # stack so deep schemas neither recurse nor build intermediate strings per level.
+        # Frames are [items iterator, indent, closing tag, is a list frame, has output].
+        stack = [[iter(schema.items()), indent, None, False, False]]
+        max_depth = self.MAX_SCHEMA_DEPTH
+        max_nodes = self.MAX_SCHEMA_NODES
+        emitted = 0
+        while stack:
+            frame = stack[-1]
+            level_indent = frame[1]
+            in_list = frame[3]
+            for key, value in frame[0]:
+                emitted += 1
+                if isinstance(value, dict):
+                    frame[4] = True
+                    yield f"{level_indent}<{key}>"
+                    stack.append([iter(value.items()), level_indent + "  ", f"{level_indent}</{key}>", False, False])
+                    break
+                if isinstance(value, list) and not in_list:
+                    stack.append([zip(itertools.repeat(key), value), level_indent, None, True, False])
+                    break
+                frame[4] = True
+                yield f"{level_indent}<{key}>[appropriate {key}]</{key}>"
             else:
-                result.append(f"{indent}<{key}>[appropriate {key}]</{key}>")
-        return "\n".join(result)
+                stack.pop()
+                if stack:
+                    if not in_list and not frame[4]:
+                        # A nested object that renders nothing still leaves an empty line
+                        yield ""
+                    if frame[2] is not None:
+                        yield frame[2]
+                    stack[-1][4] = stack[-1][4] or frame[4] or not in_list
+                continue
+            if len(stack) > max_depth or emitted > max_nodes:
+                self._raise_schema_limit(len(stack), emitted)
 
     def format_key_schema_for_llm(self, schema):
         if isinstance(schema, str):
@@ -160,19 +560,60 @@ Your response should be a valid {schema_type} structure that follows the provide
         return self._format_key_dict(schema)
 
     def _format_key_dict(self, schema, prefix=""):
-        result = []
-        for key, value in schema.items():
+        return "\n".join(self.iter_key_schema_lines(schema, prefix))
+
+    def iter_key_schema_lines(self, schema, prefix=""):
+        # Iterative counterpart of the HTML walker; frames are [items iterator, path prefix, list key or None, has output]
+        stack = [[iter(schema.items()), prefix, None, False]]
+        max_depth = self.MAX_SCHEMA_DEPTH
+        max_nodes = self.MAX_SCHEMA_NODES
+        emitted = 0
+        while stack:
+            frame = stack[-1]
+            level_prefix = frame[1]
+            list_key = frame[2]
+            for key, value in frame[0]:
+                emitted += 1
+                if list_key is not None:
+                    key, value, path = list_key, value, f"{level_prefix}{list_key}[{key}]"
+                else:
+                    path = f"{level_prefix}{key}"
+                if isinstance(value, dict):
+                    stack.append([iter(value.items()), f"{path}.", None, False])
+                    break
+                if isinstance(value, list) and list_key is None:
+                    stack.append([enumerate(value), level_prefix, key, False])
+                    break
+                frame[3] = True
+                yield f"{path}: [appropriate {key}]"
+            else:
+                stack.pop()
+                if stack:
+                    if list_key is None and not frame[3]:
+                        yield ""
+                    stack[-1][3] = stack[-1][3] or frame[3] or list_key is None
+                continue
+            if len(stack) > max_depth or emitted > max_nodes:
+                self._raise_schema_limit(len(stack), emitted)
+
+    def _raise_schema_limit(self, depth, nodes):
+        if depth > self.MAX_SCHEMA_DEPTH:
+            raise ValueError(f"Schema is nested deeper than {self.MAX_SCHEMA_DEPTH} levels")
+        raise ValueError(f"Schema has more than {self.MAX_SCHEMA_NODES} fields")
+
+    def check_schema_limits(self, schema):
+        # Walks the parsed schema without recursion and rejects ones too deep or too large to render safely
+        stack = [(schema, 1)]
+        nodes = 0
+        while stack:
+            value, depth = stack.pop()
+            nodes += 1
+            if depth > self.MAX_SCHEMA_DEPTH or nodes > self.MAX_SCHEMA_NODES:
+                self._raise_schema_limit(depth, nodes)
             if isinstance(value, dict):
-                result.append(self._format_key_dict(value, f"{prefix}{key}."))
+                stack.extend((item, depth + 1) for item in value.values())
             elif isinstance(value, list):
-                for i, item in enumerate(value):
-                    if isinstance(item, dict):
-                        result.append(self._format_key_dict(item, f"{prefix}{key}[{i}]."))
-                    else:
-                        result.append(f"{prefix}{key}[{i}]: [appropriate {key}]")
-            else:
-                result.append(f"{prefix}{key}: [appropriate {key}]")
-        return "\n".join(result)
+                stack.extend((item, depth + 1) for item in value)
 
     def format_visual_layer_breakdown_for_llm(self, schema):
         result = []
@@ -206,4 +647,13 @@ Your response should be a valid {schema_type} structure that follows the provide
         for aspect, description in schema.items():
             result.append(f"\n{aspect.capitalize()}:")
             result.append(f"  [Describe the {aspect}. {description}]")
-        return "\n".join(result)
\ No newline at end of file
+        return "\n".join(result)
+
+
+metrics.register_cache("rendered_schema", PromptJSON.rendered_schema_cache.info)
+metrics.register_cache("parsed_schema", PromptJSON.parsed_schema_cache.info)
+metrics.register_cache("grammar", PromptJSON.grammar_cache.info)
+metrics.register_cache("system_prompt", PromptTemplates.cache_info)
+
+# Default schemas are cached parsed and rendered, so a template reload has to drop them
+registry.add_listener(PromptJSON.clear_caches)
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import logging
+from .PromptJSON import EXAMPLE_SELECTIONS, LAYOUTS, SCHEMA_FORMATS, PromptJSON
+from .dedup import DEDUP_MODES, dedup_records
+from .prompt_templates import PromptTemplates
+from .records import normalize_record
+
+logger = logging.getLogger(__name__)
+
+BATCH_FORMATS = ["Lines", "JSONL"]
+
+
+def parse_prompt_batch(text, batch_format):
+    records = []
+    for line_number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line:
+            continue
+        if batch_format == "Lines":
+            records.append({"prompt": line})
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            logger.error("Skipping invalid JSONL prompt on line %d: %s", line_number, e)
+            continue
+        try:
+            record = normalize_record(record)
+        except (ValueError, TypeError) as e:
+            logger.error("Skipping JSONL prompt on line %d: %s", line_number, e)
+            continue
+        if record is None:
+            logger.error("Skipping JSONL prompt on line %d: expected a string or an object with a \"prompt\" field", line_number)
+        else:
+            records.append(record)
+    return records
+
+
+class PromptJSONBatch(PromptJSON):
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "prompts": ("STRING", {"multiline": True}),
+                "batch_format": (BATCH_FORMATS,),
+                "negative_prompt": ("STRING", {"multiline": True}),
+                "complexity": ("FLOAT", {"default": 0.5, "min": 0.1, "max": 1.0, "step": 0.1}),
+                "llm_prompt_type": (PromptTemplates.LLM_PROMPT_TYPES,),
+                "schema_type": (PromptTemplates.schema_types(),),
+                "enhance_prompt": ("BOOLEAN", {"default": False}),
+            },
+            "optional": {
+                "custom_schema": ("STRING", {"multiline": True}),
+                "layout": (LAYOUTS,),
+                "schema_format": (SCHEMA_FORMATS,),
+                "example_selection": (EXAMPLE_SELECTIONS,),
+                "dedup": (DEDUP_MODES,),
+                "dedup_threshold": ("FLOAT", {"default": 0.8, "min": 0.5, "max": 1.0, "step": 0.05}),
+            }
+        }
+
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        payload = json.dumps([PromptTemplates.template_version(), kwargs], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    INPUT_IS_LIST = True
+    OUTPUT_IS_LIST = (True, True, True, True, False)
+    RETURN_TYPES = ("STRING", "STRING", "STRING", "STRING", "STRING")
+    RETURN_NAMES = ("system_prompt", "user_prompt", "negative_passthru", "schema", "mapping")
+    FUNCTION = "process"
+    CATEGORY = "prompt_converters"
+
+    def process(self, prompts, batch_format, negative_prompt, complexity, llm_prompt_type, schema_type, enhance_prompt, custom_schema=None, layout=None, schema_format=None,
+                example_selection=None, dedup=None, dedup_threshold=None):
+        # INPUT_IS_LIST delivers every input as a list; only `prompts` is expected to hold more than one entry
+        batch_format = batch_format[0]
+        default_negative = negative_prompt[0]
+        custom_schema = custom_schema[0] if custom_schema else ""
+        layout = layout[0] if layout else "Standard"
+        schema_format = schema_format[0] if schema_format else "Pretty"
+        example_selection = example_selection[0] if example_selection else "Fixed Tiers"
+        dedup = dedup[0] if dedup else "Off"
+        dedup_threshold = dedup_threshold[0] if dedup_threshold else 0.8
+
+        records = []
+        for text in prompts:
+            for record in parse_prompt_batch(text, batch_format):
+                record.setdefault("negative_prompt", default_negative)
+                records.append(record)
+        logger.debug("Starting batch process with %d prompts, schema_type: %s", len(records), schema_type[0])
+        # Only one representative per group of near-identical prompts is built; mapping fans results back out
+        records, mapping = dedup_records(records, dedup, dedup_threshold)
+        if dedup != "Off":
+            logger.debug("Dedup (%s) kept %d of %d prompts", dedup, len(records), len(mapping))
+
+        outputs = ([], [], [], [])
+        for row in self.iter_batch(records, complexity[0], llm_prompt_type[0], schema_type[0], enhance_prompt[0], custom_schema, layout,
+                                   schema_format, example_selection):
+            for output, value in zip(outputs, row):
+                output.append(value)
+        return outputs + (json.dumps(mapping),)
@@ -0,0 +1,45 @@
+import json
+import logging
+from .response_store import get_store, response_key
+
+logger = logging.getLogger(__name__)
+
+
+class PromptJSONCache:
+    # Looks up the LLM response for a system/user prompt pair in the persistent response store. `response`
+    # is a lazy input: on a hit it is never requested, so the upstream LLM node does not run.
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "system_prompt": ("STRING", {"forceInput": True}),
+                "user_prompt": ("STRING", {"forceInput": True}),
+                "response": ("STRING", {"forceInput": True, "lazy": True}),
+                "namespace": ("STRING", {"default": ""}),
+            },
+        }
+
+    RETURN_TYPES = ("STRING", "BOOLEAN", "STRING")
+    RETURN_NAMES = ("response", "cache_hit", "stats")
+    FUNCTION = "process"
+    CATEGORY = "prompt_converters"
+
+    def check_lazy_status(self, system_prompt, user_prompt, namespace, response=None):
+        if response is None and response_key(system_prompt, user_prompt, namespace) not in get_store():
+            return ["response"]
+        return []
+
+    def process(self, system_prompt, user_prompt, namespace, response=None):
+        store = get_store()
+        key = response_key(system_prompt, user_prompt, namespace)
+        cached = store.get(key)
+        if cached is not None:
+            return (cached, True, json.dumps(store.stats()))
+        if response is None:
+            # Evicted between check_lazy_status and now; nothing to return without the LLM node
+            logger.warning("Cached response disappeared before it could be read; returning an empty response")
+            response = ""
+        elif response:
+            # Empty responses are usually failed requests and are not cached
+            store.put(key, response)
+        return (response, False, json.dumps(store.stats()))
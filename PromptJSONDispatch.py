@@ -0,0 +1,68 @@
+import logging
+import os
+from . import llm_client
+from .response_store import get_store
+
+logger = logging.getLogger(__name__)
+
+
+class PromptJSONDispatch:
+    # Sends system/user prompt pairs to an OpenAI-compatible /chat/completions endpoint. Takes lists (e.g. from
+    # the batch node) and runs them concurrently on a shared asyncio loop instead of one call per execution.
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "system_prompt": ("STRING", {"forceInput": True}),
+                "user_prompt": ("STRING", {"forceInput": True}),
+                "base_url": ("STRING", {"default": os.environ.get("PROMPTJSON_LLM_BASE_URL", "http://127.0.0.1:8000/v1")}),
+                "model": ("STRING", {"default": ""}),
+                "max_in_flight": ("INT", {"default": 8, "min": 1, "max": 1024}),
+                "max_retries": ("INT", {"default": 3, "min": 0, "max": 20}),
+                "temperature": ("FLOAT", {"default": 0.7, "min": 0.0, "max": 2.0, "step": 0.05}),
+                "max_tokens": ("INT", {"default": 1024, "min": 1, "max": 1048576}),
+                "timeout": ("FLOAT", {"default": 120.0, "min": 1.0, "max": 3600.0}),
+            },
+            "optional": {
+                "api_key": ("STRING", {"default": ""}),
+                "use_response_cache": ("BOOLEAN", {"default": False}),
+            }
+        }
+
+    INPUT_IS_LIST = True
+    OUTPUT_IS_LIST = (True, True)
+    RETURN_TYPES = ("STRING", "STRING")
+    RETURN_NAMES = ("response", "error")
+    FUNCTION = "process"
+    CATEGORY = "prompt_converters"
+
+    def process(self, system_prompt, user_prompt, base_url, model, max_in_flight, max_retries, temperature, max_tokens, timeout,
+                api_key=None, use_response_cache=None):
+        # Settings arrive as one-element lists; a single system prompt is shared by every user prompt
+        api_key = (api_key[0] if api_key else "") or os.environ.get("PROMPTJSON_LLM_API_KEY", "")
+        client = llm_client.get_client(base_url[0], api_key, max_in_flight[0], max_retries[0], timeout[0])
+        count = max(len(system_prompt), len(user_prompt))
+        pairs = [(system_prompt[index % len(system_prompt)], user_prompt[index % len(user_prompt)]) for index in range(count)]
+        logger.debug("Dispatching %d prompts to %s with max_in_flight: %d", count, base_url[0], max_in_flight[0])
+
+        # Answered from the response store where possible; only the misses are sent, and their responses stored
+        store = get_store() if use_response_cache and use_response_cache[0] else None
+        results = [store.lookup(system, user, model[0]) if store else None for system, user in pairs]
+        pending = [index for index, result in enumerate(results) if result is None]
+        if pending:
+            fetched = llm_client.run(client.chat_many([pairs[index] for index in pending], model[0],
+                                                      temperature=temperature[0], max_tokens=max_tokens[0]))
+            for index, result in zip(pending, fetched):
+                results[index] = result
+                if store and isinstance(result, str) and result:
+                    store.store(*pairs[index], result, model[0])
+        responses, errors = [], []
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error("LLM request failed: %s", result)
+                responses.append("")
+                errors.append(str(result) or type(result).__name__)
+            else:
+                responses.append(result)
+                errors.append("")
+        return (responses, errors)
@@ -0,0 +1,35 @@
+import json
+import logging
+from .dedup import fan_out
+
+logger = logging.getLogger(__name__)
+
+
+class PromptJSONFanOut:
+    # Expands one value per deduplicated prompt (e.g. LLM responses) back to one value per original prompt,
+    # using the `mapping` output of the batch node.
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "values": ("STRING", {"forceInput": True}),
+                "mapping": ("STRING", {"forceInput": True}),
+            },
+        }
+
+    INPUT_IS_LIST = True
+    OUTPUT_IS_LIST = (True,)
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("values",)
+    FUNCTION = "process"
+    CATEGORY = "prompt_converters"
+
+    def process(self, values, mapping):
+        try:
+            mapping = json.loads(mapping[0])
+        except (json.JSONDecodeError, TypeError) as e:
+            raise ValueError(f"Invalid mapping: {e}")
+        if not isinstance(mapping, list) or any(not isinstance(group, int) or not 0 <= group < len(values) for group in mapping):
+            raise ValueError(f"Mapping does not fit {len(values)} values; connect the mapping from the same batch")
+        logger.debug("Fanning out %d values to %d prompts", len(values), len(mapping))
+        return (fan_out(values, mapping),)
@@ -0,0 +1,61 @@
+import json
+import logging
+from collections import Counter
+from .PromptJSONParse import PromptJSONParse
+from .metrics import metrics
+from .negative_terms import get_scanner
+from .prompt_templates import PromptTemplates
+
+logger = logging.getLogger(__name__)
+
+
+class PromptJSONNegativeCheck:
+    # Reports negative prompt terms that leaked into LLM responses, per response field. Takes lists, so a
+    # whole batch of responses is checked in one execution.
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "response": ("STRING", {"forceInput": True}),
+                "negative_prompt": ("STRING", {"multiline": True}),
+                "schema_type": (PromptTemplates.schema_types(),),
+            },
+            "optional": {
+                "custom_schema": ("STRING", {"multiline": True}),
+            }
+        }
+
+    INPUT_IS_LIST = True
+    OUTPUT_IS_LIST = (True, True, False)
+    RETURN_TYPES = ("STRING", "BOOLEAN", "STRING")
+    RETURN_NAMES = ("violations", "is_clean", "report")
+    FUNCTION = "process"
+    CATEGORY = "prompt_converters"
+
+    @staticmethod
+    def check(response, negative_prompt, validator):
+        # (path, term) pairs; responses that cannot be parsed are scanned as a whole
+        scanner = get_scanner(negative_prompt)
+        if not scanner.terms:
+            return []
+        data = validator.parse(response, [])
+        if data is None:
+            return [("response", term) for term in scanner.scan(response)]
+        return scanner.scan_fields(data)
+
+    def process(self, response, negative_prompt, schema_type, custom_schema=None):
+        # Settings arrive as one-element lists; negative prompts pair up with responses like the dispatch node's prompts
+        validator = PromptJSONParse.get_validator(schema_type[0], custom_schema[0] if custom_schema else "")
+        violations, clean, terms = [], [], Counter()
+        with metrics.stage("negative_check"):
+            for index, text in enumerate(response):
+                hits = self.check(text, negative_prompt[index % len(negative_prompt)], validator)
+                violations.append("\n".join(f"{path}: {term}" for path, term in hits))
+                clean.append(not hits)
+                terms.update(term for _, term in hits)
+        leaked = clean.count(False)
+        if leaked:
+            logger.info("%d of %d responses contain negative prompt terms", leaked, len(response))
+            metrics.increment("negative_leaks", leaked)
+        report = {"responses": len(response), "clean": len(response) - leaked, "terms": dict(terms.most_common())}
+        return (violations, clean, json.dumps(report, ensure_ascii=False))
@@ -0,0 +1,556 @@
+import collections
+import json
+import logging
+import re
+from .PromptJSON import PromptJSON
+from .caching import LRUCache, content_hash
+from .prompt_templates import PromptTemplates
+from .template_registry import registry
+
+logger = logging.getLogger(__name__)
+
+_FENCE_RE = re.compile(r"^\s*```[\w-]*\s*\n(.*?)\n?\s*```\s*$", re.DOTALL)
+_TAG_RE = re.compile(r"<(/?)([A-Za-z_][\w\-.:]*)\s*>")
+_KEY_SEGMENT_RE = re.compile(r"^([^.\[\]]+)((?:\[\d+\])*)$")
+_PLACEHOLDER_RE = re.compile(r"^\[[^\[\]]*\]$")
+
+LEAF = ("leaf",)
+
+
+def strip_code_fence(text):
+    match = _FENCE_RE.match(text)
+    return match.group(1) if match else text
+
+
+def parse_key_path(path):
+    # "object[1].description" -> ["object", 1, "description"]
+    parts = []
+    for segment in path.split("."):
+        match = _KEY_SEGMENT_RE.match(segment.strip())
+        if not match:
+            return None
+        parts.append(match.group(1))
+        parts.extend(int(index) for index in re.findall(r"\d+", match.group(2)))
+    return parts
+
+
+def set_key_path(root, parts, value):
+    node = root
+    for position, part in enumerate(parts):
+        last = position == len(parts) - 1
+        child = value if last else ([] if isinstance(parts[position + 1], int) else {})
+        if isinstance(part, int):
+            if not isinstance(node, list):
+                return False
+            node.extend([None] * (part + 1 - len(node)))
+            if last or node[part] is None:
+                node[part] = child
+            node = node[part]
+        else:
+            if not isinstance(node, dict):
+                return False
+            if last:
+                node[part] = child
+            else:
+                node = node.setdefault(part, child)
+    return True
+
+
+def parse_key_lines(text, violations):
+    result = {}
+    for line_number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line:
+            continue
+        path, sep, value = line.partition(":")
+        parts = parse_key_path(path) if sep else None
+        if not parts:
+            violations.append(f"line {line_number}: expected 'key.path: value', got {line[:60]!r}")
+            continue
+        if not set_key_path(result, parts, value.strip()):
+            violations.append(f"line {line_number}: path {path.strip()!r} conflicts with an earlier line")
+    return result
+
+
+def parse_html_tags(text, violations):
+    root = {"tag": None, "children": [], "text": []}
+    stack = [root]
+    position = 0
+    for match in _TAG_RE.finditer(text):
+        stack[-1]["text"].append(text[position:match.start()])
+        position = match.end()
+        closing, tag = match.groups()
+        if not closing:
+            element = {"tag": tag, "children": [], "text": []}
+            stack[-1]["children"].append(element)
+            stack.append(element)
+        elif len(stack) > 1 and stack[-1]["tag"] == tag:
+            stack.pop()
+        else:
+            violations.append(f"unexpected closing tag </{tag}>")
+    stack[-1]["text"].append(text[position:])
+    for element in stack[1:]:
+        violations.append(f"unclosed tag <{element['tag']}>")
+    if "".join(root["text"]).strip():
+        violations.append("text outside of tags (preamble or summary)")
+    return _html_element_value(root)
+
+
+def _html_element_value(element):
+    if not element["children"]:
+        return "".join(element["text"]).strip()
+    # Tags that repeat under one parent become lists
+    counts = collections.Counter(child["tag"] for child in element["children"])
+    result = {}
+    for child in element["children"]:
+        value = _html_element_value(child)
+        if counts[child["tag"]] > 1:
+            result.setdefault(child["tag"], []).append(value)
+        else:
+            result[child["tag"]] = value
+    return result
+
+
+def parse_attribute_lines(text, violations):
+    result = {}
+    for line_number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("[") and line.endswith("]"):
+            line = line[1:-1]
+        name, sep, value = line.partition(":")
+        if not sep or not name.strip():
+            violations.append(f"line {line_number}: expected '[Attribute: value]', got {line[:60]!r}")
+            continue
+        result[name.strip()] = value.strip()
+    return result
+
+
+def parse_json_object(text, violations):
+    start = text.find("{")
+    end = text.rfind("}")
+    if start == -1 or end < start:
+        violations.append("no JSON object found")
+        return None
+    if text[:start].strip() or text[end + 1:].strip():
+        violations.append("text outside of the JSON object (preamble or summary)")
+    try:
+        data = json.loads(text[start:end + 1])
+    except ValueError as e:
+        violations.append(f"invalid JSON: {str(e)}")
+        return None
+    return data
+
+
+def shape_of(value):
+    # Reduce a schema (or parsed template) to the structure responses are checked against
+    if isinstance(value, dict):
+        return ("dict", {key: shape_of(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        item_shape = LEAF
+        for item in value:
+            item_shape = merge_shapes(item_shape, shape_of(item))
+        return ("list", item_shape)
+    return LEAF
+
+
+def merge_shapes(a, b):
+    if a == LEAF:
+        return b
+    if b == LEAF:
+        return a
+    if a[0] == "list" and b[0] == "list":
+        return ("list", merge_shapes(a[1], b[1]))
+    if a[0] == "list":
+        return ("list", merge_shapes(a[1], b))
+    if b[0] == "list":
+        return ("list", merge_shapes(a, b[1]))
+    fields = dict(a[1])
+    for key, item in b[1].items():
+        fields[key] = merge_shapes(fields[key], item) if key in fields else item
+    return ("dict", fields)
+
+
+class ResponseValidator:
+    def __init__(self, schema_type, schema, strict=False):
+        if schema_type not in PromptTemplates.schema_types():
+            raise ValueError(f"Unsupported schema type: {schema_type}")
+        self.schema_type = schema_type
+        self.kind = PromptTemplates.render_kind(schema_type)
+        self.strict = strict
+        if self.kind == "HTML":
+            schema = parse_html_tags(schema, []) if isinstance(schema, str) else schema
+        elif self.kind == "Key":
+            schema = parse_key_lines(schema, []) if isinstance(schema, str) else schema
+        elif self.kind == "Attribute-Based":
+            schema = parse_attribute_lines("\n".join(schema), [])
+        self.shape = shape_of(schema)
+
+    def parse(self, response, violations):
+        text = strip_code_fence(response or "").strip()
+        if not text:
+            violations.append("empty response")
+            return None
+        # Runaway generations can nest thousands of levels deep; report that instead of raising
+        try:
+            return self._parse(text, violations)
+        except RecursionError:
+            violations.append("response is nested too deeply to parse")
+            return None
+
+    def _parse(self, text, violations):
+        if self.kind == "HTML":
+            return parse_html_tags(text, violations)
+        if self.kind == "Key":
+            return parse_key_lines(text, violations)
+        if self.kind == "Attribute-Based":
+            return parse_attribute_lines(text, violations)
+        if self.schema_type == "JSON" or text.startswith("{"):
+            return parse_json_object(text, violations)
+        # The other JSON-family schemas are commonly answered as "key: value" lines
+        return parse_key_lines(text, violations)
+
+    def validate(self, data, violations=None, shape=None, path=""):
+        violations = [] if violations is None else violations
+        shape = self.shape if shape is None else shape
+        label = path or "response"
+        if shape[0] == "dict":
+            if isinstance(data, list):
+                for index, item in enumerate(data):
+                    self.validate(item, violations, shape, f"{path}[{index}]")
+            elif not isinstance(data, dict):
+                violations.append(f"{label}: expected an object, got {type(data).__name__}")
+            else:
+                fields = shape[1]
+                for key, value in data.items():
+                    child = f"{path}.{key}" if path else key
+                    if key in fields:
+                        self.validate(value, violations, fields[key], child)
+                    elif self.strict:
+                        violations.append(f"{child}: unexpected field")
+                    else:
+                        self._check_leaves(value, violations, child)
+                if self.strict:
+                    for key in fields:
+                        if key not in data:
+                            violations.append(f"{(path + '.') if path else ''}{key}: missing field")
+        elif shape[0] == "list":
+            if isinstance(data, list):
+                for index, item in enumerate(data):
+                    self.validate(item, violations, shape[1], f"{path}[{index}]")
+            else:
+                # A single item where the schema shows a list is fine
+                self.validate(data, violations, shape[1], path)
+        else:
+            self._check_leaves(data, violations, label)
+        return violations
+
+    def _check_leaves(self, value, violations, path):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                self._check_leaves(item, violations, f"{path}.{key}")
+        elif isinstance(value, list):
+            for index, item in enumerate(value):
+                self._check_leaves(item, violations, f"{path}[{index}]")
+        elif value is None or (isinstance(value, str) and not value.strip()):
+            violations.append(f"{path}: empty value")
+        elif isinstance(value, str) and _PLACEHOLDER_RE.match(value.strip()):
+            violations.append(f"{path}: unfilled placeholder {value.strip()}")
+
+    def check(self, response):
+        violations = []
+        data = self.parse(response, violations)
+        if data is not None:
+            try:
+                self.validate(data, violations)
+            except RecursionError:
+                violations.append("response is nested too deeply to validate")
+        return data, violations
+
+    def top_level_fields(self):
+        shape = self.shape[1] if self.shape[0] == "list" else self.shape
+        return shape[1] if shape[0] == "dict" else {}
+
+    def incremental(self, max_chars=None):
+        return IncrementalResponseParser(self, max_chars)
+
+
+class IncrementalResponseParser:
+    # Consumes a response chunk by chunk. feed() returns the (path, value) fields completed by that chunk;
+    # once the output stops following the schema, `diverged` holds the reason and further chunks are ignored.
+    def __init__(self, validator, max_chars=None):
+        self.validator = validator
+        self.max_chars = max_chars
+        self.diverged = None
+        self._chunks = []
+        self._length = 0
+        self._buffer = ""
+        self._mode = None
+        self._line_number = 0
+        # JSON scanner state
+        self._brackets = []
+        self._in_string = False
+        self._escape = False
+        self._member_start = None
+        self._scan_position = 0
+        self._done = False
+        # HTML state: open tags with their collected text
+        self._stack = []
+        self._flushed = False
+
+    def feed(self, chunk):
+        if self.diverged or not chunk:
+            return []
+        self._chunks.append(chunk)
+        self._length += len(chunk)
+        if self.max_chars is not None and self._length > self.max_chars:
+            self._diverge(f"response exceeds {self.max_chars} characters")
+            return []
+        self._buffer += chunk
+        events = []
+        if self._mode is None:
+            self._detect_mode()
+        if self._mode == "json":
+            self._scan_json(events)
+        elif self._mode == "html":
+            self._scan_html(events, final=False)
+        elif self._mode == "lines":
+            self._scan_lines(events, final=False)
+        return events
+
+    def flush(self):
+        # Fields completed by the end of the response, such as a last line without a trailing newline. Call it
+        # after the last feed() to receive them; close() flushes too but only returns the full parse.
+        if self._flushed:
+            return []
+        self._flushed = True
+        events = []
+        if not self.diverged:
+            if self._mode is None:
+                self._detect_mode(final=True)
+            if self._mode == "html":
+                self._scan_html(events, final=True)
+            elif self._mode == "lines":
+                self._scan_lines(events, final=True)
+        return events
+
+    def close(self):
+        self.flush()
+        data, violations = self.validator.check("".join(self._chunks))
+        if self.diverged:
+            violations.insert(0, f"generation aborted: {self.diverged}")
+        return data, violations
+
+    @property
+    def text(self):
+        return "".join(self._chunks)
+
+    def _diverge(self, reason):
+        self.diverged = reason
+        self._buffer = ""
+
+    def _detect_mode(self, final=False):
+        stripped = self._buffer.lstrip()
+        if stripped.startswith("```"):
+            newline = stripped.find("\n")
+            if newline == -1:
+                return
+            self._buffer = stripped[newline + 1:]
+            stripped = self._buffer.lstrip()
+        if not stripped or (len(stripped) < 3 and not final):
+            return
+        schema_type = self.validator.schema_type
+        kind = self.validator.kind
+        if kind == "HTML":
+            self._mode = "html"
+        elif kind in ("Key", "Attribute-Based"):
+            self._mode = "lines"
+        elif stripped.startswith("{"):
+            self._mode = "json"
+        elif schema_type == "JSON":
+            self._diverge("expected a JSON object")
+        else:
+            self._mode = "lines"
+        self._buffer = stripped
+
+    def _scan_json(self, events):
+        buffer = self._buffer
+        for position in range(self._scan_position, len(buffer)):
+            char = buffer[position]
+            if self._done:
+                if not char.isspace() and char != "`":
+                    self._diverge("text after the JSON object")
+                    return
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if char == '"':
+                self._in_string = True
+                if len(self._brackets) == 1 and self._member_start is None:
+                    self._member_start = position
+            elif char in "{[":
+                if not self._brackets and char != "{":
+                    self._diverge("expected a JSON object")
+                    return
+                self._brackets.append("}" if char == "{" else "]")
+            elif char in "}]":
+                if self._brackets.pop() != char:
+                    self._diverge(f"mismatched {char!r}")
+                    return
+                if not self._brackets:
+                    self._emit_json_member(buffer, position, events)
+                    self._done = True
+            elif char == "," and len(self._brackets) == 1:
+                self._emit_json_member(buffer, position, events)
+            elif not self._brackets and not char.isspace():
+                self._diverge("expected a JSON object")
+                return
+            if self.diverged:
+                return
+        # Keep only the unfinished member; everything before it has been scanned
+        if self._member_start is None:
+            self._buffer = ""
+        else:
+            self._buffer = buffer[self._member_start:]
+            self._member_start = 0
+        self._scan_position = len(self._buffer)
+
+    def _emit_json_member(self, buffer, end, events):
+        if self._member_start is None:
+            return
+        member = buffer[self._member_start:end]
+        self._member_start = None
+        try:
+            key, value = next(iter(json.loads("{" + member + "}").items()))
+        except (ValueError, StopIteration, RecursionError):
+            self._diverge(f"invalid JSON member {member.strip()[:60]!r}")
+            return
+        self._emit(key, value, events)
+
+    def _scan_lines(self, events, final):
+        lines = self._buffer.split("\n")
+        self._buffer = "" if final else lines.pop()
+        for line in lines:
+            self._line_number += 1
+            line = line.strip()
+            if not line or line.startswith("```"):
+                continue
+            if self.validator.kind == "Attribute-Based":
+                parsed = parse_attribute_lines(line, [])
+                if not parsed:
+                    self._diverge(f"line {self._line_number}: expected '[Attribute: value]', got {line[:60]!r}")
+                    return
+                name, value = next(iter(parsed.items()))
+                self._emit(name, value, events)
+            else:
+                path, sep, value = line.partition(":")
+                parts = parse_key_path(path) if sep else None
+                if not parts:
+                    self._diverge(f"line {self._line_number}: expected 'key.path: value', got {line[:60]!r}")
+                    return
+                self._emit(path.strip(), value.strip(), events, field=parts[0])
+            if self.diverged:
+                return
+
+    def _scan_html(self, events, final):
+        buffer = self._buffer
+        position = 0
+        while True:
+            match = _TAG_RE.search(buffer, position)
+            if match is None:
+                break
+            self._html_text(buffer[position:match.start()])
+            position = match.end()
+            closing, tag = match.groups()
+            if not closing:
+                if self._stack:
+                    self._stack[-1][2] = True
+                self._stack.append([tag, [], False])
+            elif self._stack and self._stack[-1][0] == tag:
+                path = ".".join(entry[0] for entry in self._stack)
+                _, text, has_children = self._stack.pop()
+                if not has_children:
+                    self._emit(path, "".join(text).strip(), events, field=path.split(".")[0])
+                elif not self._stack and self.validator.strict:
+                    self._check_field(tag)
+            else:
+                self._diverge(f"unexpected closing tag </{tag}>")
+            if self.diverged:
+                return
+        rest = buffer[position:]
+        partial = rest.rfind("<")
+        # Hold back a possibly incomplete tag
+        if partial != -1 and not final and len(rest) - partial < 128:
+            self._html_text(rest[:partial])
+            self._buffer = rest[partial:]
+        else:
+            self._html_text(rest)
+            self._buffer = ""
+
+    def _html_text(self, text):
+        if self._stack:
+            self._stack[-1][1].append(text)
+        elif text.strip() and text.strip() != "```":
+            self._diverge("text outside of tags")
+
+    def _check_field(self, field):
+        if self.validator.strict and self.validator.top_level_fields() and field not in self.validator.top_level_fields():
+            self._diverge(f"unexpected field {field!r}")
+
+    def _emit(self, path, value, events, field=None):
+        self._check_field(field if field is not None else path)
+        if not self.diverged:
+            events.append((path, value))
+
+
+class PromptJSONParse:
+    # Compiled validators keyed by (schema_type, content hash of custom_schema, strict)
+    validator_cache = LRUCache(maxsize=64)
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "response": ("STRING", {"multiline": True}),
+                "schema_type": (PromptTemplates.schema_types(),),
+                "strict": ("BOOLEAN", {"default": False}),
+            },
+            "optional": {
+                "custom_schema": ("STRING", {"multiline": True}),
+            }
+        }
+
+    RETURN_TYPES = ("STRING", "STRING", "BOOLEAN")
+    RETURN_NAMES = ("parsed_json", "violations", "is_valid")
+    FUNCTION = "process"
+    CATEGORY = "prompt_converters"
+
+    @classmethod
+    def get_validator(cls, schema_type, custom_schema="", strict=False):
+        key = (schema_type, content_hash(custom_schema), bool(strict))
+        validator = cls.validator_cache.get(key)
+        if validator is None:
+            schema = PromptJSON().parse_custom_schema(custom_schema, schema_type)
+            validator = cls.validator_cache.put(key, ResponseValidator(schema_type, schema, bool(strict)))
+        return validator
+
+    def process(self, response, schema_type, strict, custom_schema=""):
+        data, violations = self.get_validator(schema_type, custom_schema, strict).check(response)
+        try:
+            parsed_json = json.dumps(data, indent=2, ensure_ascii=False) if data is not None else ""
+        except RecursionError:
+            parsed_json = ""
+            violations.append("response is nested too deeply to output")
+        if violations:
+            logger.info("%s response has %d schema violation(s)", schema_type, len(violations))
+        return (parsed_json, "\n".join(violations), not violations)
+
+
+registry.add_listener(PromptJSONParse.validator_cache.clear)
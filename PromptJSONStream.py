@@ -0,0 +1,210 @@
+import csv
+import hashlib
+import itertools
+import json
+import logging
+import os
+from .PromptJSON import EXAMPLE_SELECTIONS, LAYOUTS, SCHEMA_FORMATS, PromptJSON
+from .caching import content_hash
+from .prompt_set import COMPRESSIONS, PromptSetWriter
+from .prompt_templates import PromptTemplates
+from .records import normalize_record
+
+logger = logging.getLogger(__name__)
+
+FILE_FORMATS = ["Auto", "JSONL", "CSV"]
+OUTPUT_FORMATS = ["JSONL", "Prompt Set"]
+CHECKPOINT_EVERY = 1000
+
+
+def iter_jsonl_records(path, offset=0, index=0):
+    # Yields (index, byte offset after the record, record); invalid lines are logged and skipped
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                record = normalize_record(json.loads(line))
+            except (ValueError, TypeError) as e:
+                logger.error("Skipping invalid record at byte %d of %s: %s", offset - len(line), path, e)
+                continue
+            if record is None:
+                logger.error("Skipping record at byte %d of %s: no \"prompt\" field", offset - len(line), path)
+                continue
+            yield index, offset, record
+            index += 1
+
+
+def iter_csv_records(path, index=0):
+    # CSV rows can span lines, so resuming skips `index` rows rather than seeking
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row_index, row in enumerate(csv.DictReader(f)):
+            if row_index < index:
+                continue
+            try:
+                record = normalize_record(row)
+            except (ValueError, TypeError) as e:
+                logger.error("Skipping invalid CSV row %d of %s: %s", row_index + 1, path, e)
+                record = None
+            if record is None:
+                continue
+            yield row_index, None, record
+
+
+def iter_prompt_file(path, file_format="Auto", checkpoint=None):
+    checkpoint = checkpoint or {}
+    if file_format == "Auto":
+        file_format = "CSV" if path.lower().endswith(".csv") else "JSONL"
+    if file_format == "CSV":
+        return iter_csv_records(path, checkpoint.get("index", 0))
+    return iter_jsonl_records(path, checkpoint.get("input_offset", 0), checkpoint.get("index", 0))
+
+
+def load_checkpoint(output_path):
+    try:
+        with open(output_path + ".offset", "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_checkpoint(output_path, checkpoint):
+    tmp_path = output_path + ".offset.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, output_path + ".offset")
+
+
+def checkpoint_source(input_path, settings):
+    # Identifies the input file and build settings a checkpoint was written for
+    stat = os.stat(input_path)
+    return {
+        "input_path": os.path.abspath(input_path),
+        "input_size": stat.st_size,
+        "input_mtime_ns": stat.st_mtime_ns,
+        "settings": content_hash(json.dumps(settings, ensure_ascii=False)),
+    }
+
+
+def stream_prompt_file(input_path, output_path, complexity=0.5, llm_prompt_type="One Shot", schema_type="JSON",
+                       enhance_prompt=False, custom_schema="", file_format="Auto", resume=True, node=None, workers=1, layout="Standard",
+                       schema_format="Pretty", example_selection="Fixed Tiers"):
+    # Streams records from input_path into output_path as JSONL, one record in memory at a time.
+    # A "<output_path>.offset" checkpoint records how far both files got, so an interrupted run can resume.
+    node = node or PromptJSON()
+    source = checkpoint_source(input_path, [complexity, llm_prompt_type, schema_type, bool(enhance_prompt), custom_schema,
+                                            file_format, layout, schema_format, example_selection])
+    checkpoint = load_checkpoint(output_path) if resume else None
+    if checkpoint and not (all(checkpoint.get(name) == value for name, value in source.items())
+                           and os.path.exists(output_path)
+                           and checkpoint.get("output_offset", 0) <= os.path.getsize(output_path)):
+        logger.info("Checkpoint for %s does not match the input file, settings or output; starting over", output_path)
+        checkpoint = None
+    if checkpoint:
+        with open(output_path, "r+b") as f:
+            f.truncate(checkpoint["output_offset"])
+        mode = "ab"
+    else:
+        checkpoint = None
+        mode = "wb"
+    written = checkpoint["written"] if checkpoint else 0
+
+    source_meta, source_records = itertools.tee(iter_prompt_file(input_path, file_format, checkpoint))
+    rows = node.build_many((record for _, _, record in source_records), complexity, llm_prompt_type, schema_type,
+                           enhance_prompt, custom_schema, workers=workers, use_processes=True, layout=layout,
+                           schema_format=schema_format, example_selection=example_selection)
+    state = dict(checkpoint or {"index": 0, "input_offset": 0, "output_offset": 0, "written": 0}, **source)
+    with open(output_path, mode) as out:
+        for (index, input_offset, _), (system_prompt, user_prompt, negative_prompt, schema) in zip(source_meta, rows):
+            line = json.dumps({
+                "id": index,
+                "system_prompt": system_prompt,
+                "user_prompt": user_prompt,
+                "negative_prompt": negative_prompt,
+                "schema": schema,
+            }, ensure_ascii=False) + "\n"
+            out.write(line.encode("utf-8"))
+            written += 1
+            state.update(index=index + 1, written=written, output_offset=out.tell())
+            if input_offset is not None:
+                state["input_offset"] = input_offset
+            if written % CHECKPOINT_EVERY == 0:
+                out.flush()
+                save_checkpoint(output_path, state)
+        out.flush()
+        state["output_offset"] = out.tell()
+    save_checkpoint(output_path, state)
+    return written
+
+
+def stream_prompt_set(input_path, output_path, complexity=0.5, llm_prompt_type="One Shot", schema_type="JSON",
+                      enhance_prompt=False, custom_schema="", file_format="Auto", compression="zlib", node=None, workers=1,
+                      layout="Standard", schema_format="Pretty", example_selection="Fixed Tiers"):
+    # Same records as stream_prompt_file, packed into an indexed prompt-set file (see prompt_set.py). The file
+    # only appears once complete, so there is no checkpoint to resume from.
+    node = node or PromptJSON()
+    source_meta, source_records = itertools.tee(iter_prompt_file(input_path, file_format))
+    rows = node.build_many((record for _, _, record in source_records), complexity, llm_prompt_type, schema_type,
+                           enhance_prompt, custom_schema, workers=workers, use_processes=True, layout=layout,
+                           schema_format=schema_format, example_selection=example_selection)
+    with PromptSetWriter(output_path, compression) as writer:
+        for (index, _, _), (system_prompt, user_prompt, negative_prompt, schema) in zip(source_meta, rows):
+            writer.add(system_prompt, user_prompt, negative_prompt, schema, index)
+        return len(writer)
+
+
+class PromptJSONStream(PromptJSON):
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "input_path": ("STRING", {"default": ""}),
+                "output_path": ("STRING", {"default": ""}),
+                "file_format": (FILE_FORMATS,),
+                "resume": ("BOOLEAN", {"default": True}),
+                "workers": ("INT", {"default": 1, "min": 1, "max": 256}),
+                "complexity": ("FLOAT", {"default": 0.5, "min": 0.1, "max": 1.0, "step": 0.1}),
+                "llm_prompt_type": (PromptTemplates.LLM_PROMPT_TYPES,),
+                "schema_type": (PromptTemplates.schema_types(),),
+                "enhance_prompt": ("BOOLEAN", {"default": False}),
+            },
+            "optional": {
+                "custom_schema": ("STRING", {"multiline": True}),
+                "layout": (LAYOUTS,),
+                "schema_format": (SCHEMA_FORMATS,),
+                "example_selection": (EXAMPLE_SELECTIONS,),
+                "output_format": (OUTPUT_FORMATS,),
+                "compression": (COMPRESSIONS,),
+            }
+        }
+
+    @classmethod
+    def IS_CHANGED(cls, input_path, **kwargs):
+        try:
+            stat = os.stat(input_path)
+            stamp = [stat.st_mtime_ns, stat.st_size]
+        except OSError:
+            stamp = None
+        payload = json.dumps([PromptTemplates.template_version(), input_path, stamp, kwargs], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    RETURN_TYPES = ("STRING", "INT")
+    RETURN_NAMES = ("output_path", "records")
+    FUNCTION = "process"
+    CATEGORY = "prompt_converters"
+    OUTPUT_NODE = True
+
+    def process(self, input_path, output_path, file_format, resume, workers, complexity, llm_prompt_type, schema_type, enhance_prompt, custom_schema="", layout="Standard",
+                schema_format="Pretty", example_selection="Fixed Tiers", output_format="JSONL", compression="zlib"):
+        logger.info("Streaming prompts from %s to %s with schema_type: %s", input_path, output_path, schema_type)
+        if output_format == "Prompt Set":
+            written = stream_prompt_set(input_path, output_path, complexity, llm_prompt_type, schema_type, enhance_prompt,
+                                        custom_schema, file_format, compression, node=self, workers=workers, layout=layout,
+                                        schema_format=schema_format, example_selection=example_selection)
+            return (output_path, written)
+        written = stream_prompt_file(input_path, output_path, complexity, llm_prompt_type, schema_type, enhance_prompt,
+                                     custom_schema, file_format, resume, node=self, workers=workers, layout=layout,
+                                     schema_format=schema_format, example_selection=example_selection)
+        return (output_path, written)
@@ -1,11 +1,41 @@
+import logging
+import os
 from .PromptJSON import PromptJSON
+from .PromptJSONBatch import PromptJSONBatch
+from .PromptJSONCache import PromptJSONCache
+from .PromptJSONDispatch import PromptJSONDispatch
+from .PromptJSONFanOut import PromptJSONFanOut
+from .PromptJSONNegativeCheck import PromptJSONNegativeCheck
+from .PromptJSONParse import PromptJSONParse
+from .PromptJSONStream import PromptJSONStream
 
 NODE_CLASS_MAPPINGS = {
     "PromptJSON": PromptJSON,
+    "PromptJSONBatch": PromptJSONBatch,
+    "PromptJSONStream": PromptJSONStream,
+    "PromptJSONParse": PromptJSONParse,
+    "PromptJSONDispatch": PromptJSONDispatch,
+    "PromptJSONCache": PromptJSONCache,
+    "PromptJSONFanOut": PromptJSONFanOut,
+    "PromptJSONNegativeCheck": PromptJSONNegativeCheck,
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
     "PromptJSON": "Prompt JSON",
+    "PromptJSONBatch": "Prompt JSON (Batch)",
+    "PromptJSONStream": "Prompt JSON (Stream File)",
+    "PromptJSONParse": "Prompt JSON (Parse Response)",
+    "PromptJSONDispatch": "Prompt JSON (LLM Dispatch)",
+    "PromptJSONCache": "Prompt JSON (Response Cache)",
+    "PromptJSONFanOut": "Prompt JSON (Fan Out)",
+    "PromptJSONNegativeCheck": "Prompt JSON (Negative Check)",
 }
 
+# Opt-in verbosity for this package only, e.g. PROMPTJSON_LOG_LEVEL=DEBUG
+if os.environ.get("PROMPTJSON_LOG_LEVEL"):
+    try:
+        logging.getLogger(__name__).setLevel(os.environ["PROMPTJSON_LOG_LEVEL"].upper())
+    except ValueError:
+        logging.getLogger(__name__).warning("Ignoring unknown PROMPTJSON_LOG_LEVEL %r", os.environ["PROMPTJSON_LOG_LEVEL"])
+
 __all__ = ['NODE_CLASS_MAPPINGS', 'NODE_DISPLAY_NAME_MAPPINGS']
\ No newline at end of file
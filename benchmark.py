@@ -0,0 +1,311 @@
+# Offline benchmark for PromptJSON.process.
+#
+#   python benchmark.py                          # full sweep, table on stdout
+#   python benchmark.py --sizes 10,100 --quick   # smaller sweep
+#   python benchmark.py --save baseline.json     # record a baseline
+#   python benchmark.py --compare baseline.json  # exit 1 if any case got slower than --threshold
+#   python benchmark.py --dedup 10000,1000000    # near-duplicate grouping throughput at these prompt counts
+#   python benchmark.py --grammar --sizes 10000  # JSON Schema/GBNF generation for large schemas
+#   python benchmark.py --schema-formats Pretty,Minified,TypeScript,Deduplicated  # token savings per format
+import argparse
+import importlib.util
+import itertools
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # Windows: peak RSS is not reported
+    resource = None
+
+
+def _load_package():
+    if __package__:
+        return sys.modules[__package__]
+    # Run as a script: import this directory as a package so the relative imports resolve
+    here = os.path.dirname(os.path.abspath(__file__))
+    spec = importlib.util.spec_from_file_location("promptjson", os.path.join(here, "__init__.py"),
+                                                  submodule_search_locations=[here])
+    package = importlib.util.module_from_spec(spec)
+    sys.modules["promptjson"] = package
+    spec.loader.exec_module(package)
+    return package
+
+
+_package = _load_package()
+PromptJSON = sys.modules[_package.__name__ + ".PromptJSON"].PromptJSON
+PromptTemplates = sys.modules[_package.__name__ + ".prompt_templates"].PromptTemplates
+estimate_tokens = sys.modules[_package.__name__ + ".token_counting"].estimate_tokens
+PromptDeduplicator = importlib.import_module(_package.__name__ + ".dedup").PromptDeduplicator
+
+PROMPT = "A serene lake at sunset with a lone fisherman in a small boat"
+NEGATIVE_PROMPT = "urban, city, crowds"
+
+
+def synthetic_schema(n_keys, depth=6):
+    # Nested dict with about n_keys leaves spread over `depth` levels; every third branch is a list of objects
+    fanout = max(2, math.ceil(n_keys ** (1.0 / depth)))
+    counter = itertools.count()
+
+    def build(level, remaining):
+        node = {}
+        if level == depth or remaining <= fanout:
+            for _ in range(max(1, remaining)):
+                index = next(counter)
+                node[f"field_{index}"] = f"[Description of field {index}]"
+            return node
+        per_child = remaining // fanout
+        for child in range(fanout):
+            share = per_child + (1 if child < remaining % fanout else 0)
+            if share <= 0:
+                continue
+            value = build(level + 1, share)
+            node[f"level{level}_{child}"] = [value] if child % 3 == 2 else value
+        return node
+
+    return build(1, n_keys)
+
+
+def custom_schema_text(schema_type, n_keys):
+    if n_keys == 0:
+        return ""
+    schema = synthetic_schema(n_keys)
+    node = PromptJSON()
+    kind = PromptTemplates.render_kind(schema_type)
+    if kind == "HTML":
+        return node._format_html_dict(schema)
+    if kind == "Key":
+        return node._format_key_dict(schema)
+    if kind == "Attribute-Based":
+        return "\n".join(f"[Attribute {i}: description of attribute {i}]" for i in range(n_keys))
+    return json.dumps(schema)
+
+
+def measure(fn, min_time):
+    # Returns (median seconds per call, calls timed)
+    fn()
+    start = time.perf_counter()
+    fn()
+    single = max(time.perf_counter() - start, 1e-7)
+    number = max(1, int(min_time / 5 / single))
+    samples = []
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return statistics.median(samples), number * 5
+
+
+def run_case(schema_type, llm_prompt_type, enhance_prompt, custom_schema, min_time, schema_format="Pretty"):
+    node = PromptJSON()
+    args = (PROMPT, NEGATIVE_PROMPT, 0.7, llm_prompt_type, schema_type, enhance_prompt, custom_schema)
+    if schema_format != "Pretty":
+        args += (0, "estimate", "Standard", schema_format)
+
+    def cold():
+        PromptJSON.clear_caches()
+        return node.process(*args)
+
+    def warm():
+        return node.process(*args)
+
+    cold_seconds, _ = measure(cold, min_time)
+    warm_seconds, _ = measure(warm, min_time)
+
+    PromptJSON.clear_caches()
+    tracemalloc.start()
+    outputs = node.process(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    prompt_text = outputs[0] + outputs[1]
+    return {
+        "cold_us": cold_seconds * 1e6,
+        "warm_us": warm_seconds * 1e6,
+        "peak_alloc_bytes": peak,
+        "output_chars": len(prompt_text),
+        "output_tokens_est": estimate_tokens(prompt_text),
+    }
+
+
+def run(sizes, min_time, schema_types=None, schema_formats=("Pretty",)):
+    # Pretty cases keep their original names so older baselines still compare; other formats report their
+    # estimated token saving against Pretty when it is part of the sweep
+    results = {}
+    for schema_type, llm_prompt_type, enhance_prompt in itertools.product(
+            schema_types or PromptTemplates.schema_types(), PromptTemplates.LLM_PROMPT_TYPES, (False, True)):
+        for n_keys in sizes:
+            custom_schema = custom_schema_text(schema_type, n_keys)
+            base = f"{schema_type}|{llm_prompt_type}|enhance={enhance_prompt}|keys={n_keys}"
+            for schema_format in schema_formats:
+                name = base if schema_format == "Pretty" else f"{base}|format={schema_format}"
+                results[name] = run_case(schema_type, llm_prompt_type, enhance_prompt, custom_schema, min_time, schema_format)
+                pretty = results.get(base) if schema_format != "Pretty" else None
+                note = ""
+                if pretty and pretty["output_tokens_est"]:
+                    saving = 1 - results[name]["output_tokens_est"] / pretty["output_tokens_est"]
+                    note = f"  {saving:>6.1%} fewer tok"
+                print_row(name, results[name], note)
+    return results
+
+
+def run_grammars(sizes, min_time, schema_types=None):
+    # Cold grammar generation only; process() builds grammars on every cache miss
+    results = {}
+    node = PromptJSON()
+    for schema_type in schema_types or PromptTemplates.schema_types():
+        for n_keys in sizes:
+            custom_schema = custom_schema_text(schema_type, n_keys)
+            node.parse_custom_schema(custom_schema, schema_type)
+
+            def cold():
+                PromptJSON.grammar_cache.clear()
+                return node.schema_grammars(custom_schema, schema_type)
+
+            cold_seconds, _ = measure(cold, min_time)
+            warm_seconds, _ = measure(lambda: node.schema_grammars(custom_schema, schema_type), min_time)
+            PromptJSON.grammar_cache.clear()
+            tracemalloc.start()
+            json_schema, gbnf = node.schema_grammars(custom_schema, schema_type)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            name = f"grammar|{schema_type}|keys={n_keys}"
+            results[name] = {
+                "cold_us": cold_seconds * 1e6,
+                "warm_us": warm_seconds * 1e6,
+                "peak_alloc_bytes": peak,
+                "output_chars": len(json_schema) + len(gbnf),
+                "output_tokens_est": estimate_tokens(gbnf),
+            }
+            print_row(name, results[name])
+    return results
+
+
+def print_row(name, result, note=""):
+    print(f"{name:<62} cold {result['cold_us']:>10.1f}us  warm {result['warm_us']:>8.1f}us  "
+          f"peak {result['peak_alloc_bytes'] / 1024:>9.1f}KiB  {result['output_chars']:>9} chars  "
+          f"~{result['output_tokens_est']:>8} tok{note}")
+    sys.stdout.flush()
+
+
+def synthetic_prompts(count, seed=0):
+    # Caption-like prompts: about ten records per base caption, varied by word order, casing and one replaced word
+    rng = random.Random(seed)
+    words = [f"word{index}" for index in range(5000)]
+    bases = [[rng.choice(words) for _ in range(12)] for _ in range(max(1, count // 10))]
+    for _ in range(count):
+        prompt = list(rng.choice(bases))
+        variant = rng.random()
+        if variant < 0.3:
+            rng.shuffle(prompt)
+        elif variant < 0.5:
+            prompt[rng.randrange(len(prompt))] = rng.choice(words)
+        elif variant < 0.6:
+            prompt = [word.upper() for word in prompt]
+        yield {"prompt": " ".join(prompt), "negative_prompt": NEGATIVE_PROMPT}
+
+
+# Scaling bounds checked by --dedup. Synthetic prompts come about ten to a caption, so well under a fifth of
+# them should start groups, and peak RSS may grow per group but only by the mapping entry per prompt.
+DEDUP_MAX_GROUP_RATIO = 0.2
+DEDUP_BYTES_PER_GROUP = 2048
+DEDUP_BYTES_PER_PROMPT = 32
+DEDUP_RSS_SLACK = 32 * 1024 * 1024
+
+
+def run_dedup(counts):
+    # Returns (results, failures); failures lists every count that broke a scaling bound
+    results = {}
+    failures = []
+    for count in counts:
+        deduplicator = PromptDeduplicator()
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else 0
+        start = time.perf_counter()
+        for record in synthetic_prompts(count):
+            deduplicator.add(record)
+        seconds = time.perf_counter() - start
+        name = f"dedup|prompts={count}"
+        groups = len(deduplicator)
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else 0
+        results[name] = {"seconds": seconds, "groups": groups, "prompts_per_second": count / seconds,
+                         "max_rss_kib": max_rss}
+        print(f"{name:<62} {seconds:>8.2f}s  {count / seconds:>10.0f} prompts/s  {groups:>9} groups  "
+              f"max rss {max_rss / 1024:>8.1f}MiB")
+        sys.stdout.flush()
+        if groups > max(1, count * DEDUP_MAX_GROUP_RATIO):
+            failures.append(f"{name} groups: {groups} > {DEDUP_MAX_GROUP_RATIO:.0%} of prompts")
+        # ru_maxrss is in KiB on Linux
+        growth = (max_rss - rss_before) * 1024
+        allowed = groups * DEDUP_BYTES_PER_GROUP + count * DEDUP_BYTES_PER_PROMPT + DEDUP_RSS_SLACK
+        if growth > allowed:
+            failures.append(f"{name} peak RSS grew {growth / 2 ** 20:.1f}MiB > {allowed / 2 ** 20:.1f}MiB allowed")
+    return results, failures
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric in ("cold_us", "warm_us"):
+            if base[metric] > 0 and result[metric] / base[metric] > threshold:
+                regressions.append(f"{name} {metric}: {base[metric]:.1f}us -> {result[metric]:.1f}us "
+                                   f"({result[metric] / base[metric]:.2f}x)")
+        if result["output_chars"] != base["output_chars"]:
+            regressions.append(f"{name} output_chars: {base['output_chars']} -> {result['output_chars']}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark PromptJSON.process across schema types, modes and schema sizes")
+    parser.add_argument("--sizes", default="0,10,100,1000,10000",
+                        help="comma-separated custom schema sizes in keys; 0 means the default schema")
+    parser.add_argument("--schema-types", default="", help="comma-separated subset of schema types")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds spent timing each case")
+    parser.add_argument("--quick", action="store_true", help="shorthand for --min-time 0.02")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="allowed slowdown ratio before failing")
+    parser.add_argument("--dedup", help="comma-separated prompt counts; time near-duplicate grouping instead of process")
+    parser.add_argument("--grammar", action="store_true", help="time JSON Schema/GBNF generation instead of process")
+    parser.add_argument("--schema-formats", default="Pretty",
+                        help="comma-separated schema_format values to sweep; other formats report token savings against Pretty")
+    args = parser.parse_args(argv)
+
+    if args.dedup:
+        _, failures = run_dedup([int(count) for count in args.dedup.split(",") if count.strip()])
+        for line in failures:
+            print(f"SCALING {line}")
+        return 1 if failures else 0
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    schema_types = [name.strip() for name in args.schema_types.split(",") if name.strip()] or None
+    min_time = 0.02 if args.quick else args.min_time
+    schema_formats = [name.strip() for name in args.schema_formats.split(",") if name.strip()] or ["Pretty"]
+    if args.grammar:
+        results = run_grammars(sizes, min_time, schema_types)
+    else:
+        results = run(sizes, min_time, schema_types, schema_formats)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+import functools
+import json
+import re
+
+JSON_SCHEMA_TYPES = ("JSON", "Visual Layer Breakdown", "Compositional Grid", "Artistic Reference")
+
+_PATH_RE = re.compile(r"^[^.\[\]]+(?:\[(?:\d+|n)\])*(?:\.[^.\[\]]+(?:\[(?:\d+|n)\])*)*$")
+_PATH_PART_RE = re.compile(r"([^.\[\]]+)|\[(\d+|n)\]")
+_HTML_LINE_RE = re.compile(r"^(\s*)<(/?)([A-Za-z_][\w\-.:]*)\s*>(?:(.*)</\3\s*>)?\s*$")
+
+
+def split_path(path):
+    # "subjects[0].type" -> ("subjects", 0, "type"); the "[n]" of deduplicated Key schemas is the first item.
+    # Returns () for anything that is not a key path.
+    path = path.strip()
+    if not _PATH_RE.match(path):
+        return ()
+    return tuple((0 if index == "n" else int(index)) if index else name.strip()
+                 for name, index in _PATH_PART_RE.findall(path))
+
+
+def iter_json_leaves(value):
+    # (parts, leaf value) in document order; empty containers have no leaves
+    stack = [((), value)]
+    while stack:
+        parts, value = stack.pop()
+        if isinstance(value, dict):
+            stack.extend(((*parts, key), item) for key, item in reversed(value.items()))
+        elif isinstance(value, (list, tuple)):
+            stack.extend(((*parts, index), item) for index, item in reversed(list(enumerate(value))))
+        else:
+            yield parts, value
+
+
+def format_path(parts):
+    path = ""
+    for part in parts:
+        path += f"[{part}]" if isinstance(part, int) else (f".{part}" if path else part)
+    return path
+
+
+def _render_json_value(value, ensure_ascii):
+    return json.dumps(value, ensure_ascii=ensure_ascii)
+
+
+def _render_text_value(value):
+    # Line-based formats must stay on one line per field
+    if isinstance(value, (list, tuple)):
+        value = ", ".join(str(item) for item in value)
+    return " ".join(str(value).split())
+
+
+class CompiledSchema:
+    # A rendered schema plus the position of every placeholder in it. The layout is worked out once, on
+    # first use, and fill() then renders "example with values" variants by joining literal segments and
+    # slot values without walking the schema again.
+    __slots__ = ("schema_type", "schema_format", "text", "_schema", "_render", "_segments", "_slots")
+
+    def __init__(self, schema, schema_type, schema_format, text, render=None):
+        self.schema_type = schema_type
+        self.schema_format = schema_format
+        self.text = text
+        self._schema = schema
+        self._render = render
+        self._segments = None
+        self._slots = None
+
+    def __repr__(self):
+        return f"CompiledSchema({self.schema_type!r}, {self.schema_format!r}, {len(self.layout()[1])} slots)"
+
+    def __str__(self):
+        return self.text
+
+    @property
+    def leaf_paths(self):
+        return tuple(slot[0] for slot in self.layout()[1])
+
+    @property
+    def leaf_parts(self):
+        return tuple(slot[1] for slot in self.layout()[1])
+
+    def layout(self):
+        # (literal segments, slots) where slots are (path, path parts, placeholder, renderer) and
+        # text == segments[0] + placeholder[0] + segments[1] + ... + segments[-1]
+        if self._segments is None:
+            segments, slots = self._compile()
+            if _join(segments, [slot[2] for slot in slots]) != self.text:
+                segments, slots = (self.text,), ()
+            self._segments, self._slots = tuple(segments), tuple(slots)
+            self._schema = self._render = None
+        return self._segments, self._slots
+
+    def resolve(self, values):
+        # One value per leaf path (None where missing); values is either keyed by leaf path or a nested
+        # object shaped like the schema, e.g. a parsed response
+        resolved = []
+        for path, parts, _, _ in self.layout()[1]:
+            if path in values:
+                resolved.append(values[path])
+                continue
+            value = values
+            for part in parts:
+                try:
+                    value = value[part]
+                except (KeyError, IndexError, TypeError):
+                    value = None
+                    break
+            resolved.append(value)
+        return resolved
+
+    def unfilled(self, values):
+        return [slot[0] for slot, value in zip(self.layout()[1], self.resolve(values))
+                if value is None or (isinstance(value, str) and not value.strip())]
+
+    def fill(self, values):
+        segments, slots = self.layout()
+        rendered = [slot[2] if value is None else slot[3](value) for slot, value in zip(slots, self.resolve(values))]
+        return _join(segments, rendered)
+
+    def _compile(self):
+        if self.schema_type in JSON_SCHEMA_TYPES and isinstance(self._schema, dict):
+            if self.schema_format == "TypeScript" or self._render is None:
+                return (self.text,), ()
+            return self._compile_json()
+        if self.schema_type == "HTML":
+            return self._compile_lines(self._html_fields())
+        if self.schema_type == "Key":
+            return self._compile_lines(self._key_fields())
+        if self.schema_type == "Attribute-Based":
+            return self._compile_lines(self._attribute_fields())
+        # The text-only renderings of the other schema types have no per-field placeholders
+        return (self.text,), ()
+
+    def _compile_json(self):
+        # Render the schema once more with numbered markers in place of the leaves and split on them
+        leaves = list(iter_json_leaves(self._schema))
+        marker = "@@slot"
+        while marker in self.text:
+            marker += "@"
+        numbered = {}
+        for index, (parts, _) in enumerate(leaves):
+            numbered[parts] = f"{marker}{index}"
+        marked = self._render(_replace_leaves(self._schema, numbered))
+        # Pretty is plain json.dumps; the compact JSON formats keep non-ASCII characters
+        render = functools.partial(_render_json_value, ensure_ascii=self.schema_format == "Pretty")
+        pieces = re.split(f'"{re.escape(marker)}(\\d+)"', marked)
+        segments = pieces[0::2]
+        slots = []
+        for index in pieces[1::2]:
+            parts, value = leaves[int(index)]
+            slots.append((format_path(parts), parts, render(value), render))
+        return segments, slots
+
+    def _compile_lines(self, fields):
+        # fields yields (start, end, path parts) character spans of the placeholders in self.text
+        segments = []
+        slots = []
+        position = 0
+        for start, end, parts in fields:
+            segments.append(self.text[position:start])
+            slots.append((format_path(parts), parts, self.text[start:end], _render_text_value))
+            position = end
+        segments.append(self.text[position:])
+        return segments, slots
+
+    def _lines(self):
+        offset = 0
+        for line in self.text.split("\n"):
+            yield offset, line
+            offset += len(line) + 1
+
+    def _key_fields(self):
+        for offset, line in self._lines():
+            path, sep, value = line.partition(":")
+            parts = split_path(path) if sep else ()
+            if not parts or not value.strip():
+                continue
+            start = offset + len(path) + 1 + len(value) - len(value.lstrip())
+            yield start, offset + len(line.rstrip()), parts
+
+    def _attribute_fields(self):
+        for offset, line in self._lines():
+            body = line.strip()
+            bracketed = body.startswith("[") and body.endswith("]")
+            name, sep, value = (body[1:-1] if bracketed else body).partition(":")
+            if not sep or not name.strip() or not value.strip():
+                continue
+            start = offset + line.index(":") + 1 + len(value) - len(value.lstrip())
+            end = offset + len(line.rstrip()) - (1 if bracketed else 0)
+            yield start, end, (name.strip(),)
+
+    def _html_fields(self):
+        # Repeated sibling tags are indexed the way PromptJSONParse turns them into lists, so leaves are
+        # collected first and given paths once the sibling counts are known.
+        # elements[i] is (parent element, tag, occurrence among same-tag siblings); element 0 is the root.
+        elements = [None]
+        counts = [{}]
+        stack = [0]
+        leaves = []
+        for offset, line in self._lines():
+            match = _HTML_LINE_RE.match(line)
+            if not match:
+                continue
+            closing, tag, inner = match.group(2), match.group(3), match.group(4)
+            if closing:
+                if len(stack) > 1:
+                    stack.pop()
+                continue
+            parent = stack[-1]
+            occurrence = counts[parent].get(tag, 0)
+            counts[parent][tag] = occurrence + 1
+            elements.append((parent, tag, occurrence))
+            counts.append({})
+            if inner is None:
+                stack.append(len(elements) - 1)
+            else:
+                leaves.append((offset + match.start(4), offset + match.end(4), len(elements) - 1))
+        fields = []
+        for start, end, element in leaves:
+            parts = []
+            while element:
+                parent, tag, occurrence = elements[element]
+                if counts[parent][tag] > 1:
+                    parts.append(occurrence)
+                parts.append(tag)
+                element = parent
+            fields.append((start, end, tuple(reversed(parts))))
+        return fields
+
+
+def _replace_leaves(value, replacements, parts=()):
+    if isinstance(value, dict):
+        return {key: _replace_leaves(item, replacements, (*parts, key)) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_replace_leaves(item, replacements, (*parts, index)) for index, item in enumerate(value)]
+    return replacements[parts]
+
+
+def _join(segments, values):
+    pieces = [segments[0]]
+    for value, segment in zip(values, segments[1:]):
+        pieces.append(value)
+        pieces.append(segment)
+    return "".join(pieces)
@@ -0,0 +1,16 @@
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def env_number(name, default, convert=int):
+    # A numeric setting from the environment; a malformed value is logged and the default used instead
+    value = os.environ.get(name, "").strip()
+    if not value:
+        return default
+    try:
+        return convert(value)
+    except ValueError:
+        logger.warning("Ignoring invalid %s=%r; using %s", name, value, default)
+        return default
@@ -0,0 +1,123 @@
+import functools
+import hashlib
+import re
+from array import array
+from .records import normalize_record
+
+DEDUP_MODES = ["Off", "Exact", "Near Duplicates"]
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall((text or "").casefold())
+
+
+@functools.lru_cache(maxsize=16384)
+def _feature_hashes(feature, count):
+    # count independent 32-bit hashes of feature from SHAKE-128 output, one per MinHash permutation.
+    # Prompt vocabularies are small, so most words are served from the cache.
+    return tuple(memoryview(hashlib.shake_128(feature.encode("utf-8")).digest(count * 4)).cast("I"))
+
+
+def normalize(text):
+    # Whitespace, casing, punctuation and word order do not matter
+    return " ".join(sorted(tokenize(text)))
+
+
+class PromptDeduplicator:
+    # Groups records whose prompt/negative_prompt pairs are near-identical. Pairs that normalize to the same
+    # text share a group directly; otherwise, with near=True, a MinHash signature of the pair's word set is
+    # looked up in an LSH index of the group representatives and joins the first one whose estimated
+    # Jaccard similarity reaches threshold. Records with different complexity or custom_schema never share
+    # a group. Only representatives are indexed, so apart from `mapping` (one integer per record) memory grows
+    # with the number of groups, not the number of records.
+    def __init__(self, threshold=0.8, near=True, num_perm=32, bands=8):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.near = near
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._partitions = {}
+        self._exact = {}
+        self._buckets = {}
+        self._signatures = array("I")
+        self._signed = array("l")
+        self.representatives = []
+        self.mapping = array("l")
+
+    def signature(self, features):
+        return array("I", map(min, zip(*(_feature_hashes(feature, self.num_perm) for feature in features))))
+
+    def add(self, record):
+        # Returns the group index of record; a record that starts a new group becomes its representative
+        normalized = normalize_record(record)
+        if normalized is None:
+            raise ValueError("expected a string or an object with a \"prompt\" field")
+        record = normalized
+        partition = self._partitions.setdefault((record.get("complexity"), record.get("custom_schema", "")), len(self._partitions))
+        prompt_tokens = tokenize(record.get("prompt"))
+        negative_tokens = tokenize(record.get("negative_prompt"))
+        exact_key = hashlib.sha1(f"{partition}\0{' '.join(sorted(prompt_tokens))}\0{' '.join(sorted(negative_tokens))}"
+                                 .encode("utf-8")).digest()
+        group = self._exact.get(exact_key)
+        if group is None and self.near and prompt_tokens:
+            features = set(prompt_tokens)
+            features.update("\0" + token for token in negative_tokens)
+            signature = self.signature(features)
+            keys = [hash((partition, band, signature[band * self.rows:(band + 1) * self.rows].tobytes()))
+                    for band in range(self.bands)]
+            group = self._match(signature, keys)
+            if group is None:
+                group = self._exact[exact_key] = self._new_group(record)
+                self._index(group, signature, keys)
+        elif group is None:
+            group = self._exact[exact_key] = self._new_group(record)
+        self.mapping.append(group)
+        return group
+
+    def _match(self, signature, keys):
+        seen = set()
+        needed = self.threshold * self.num_perm
+        for key in keys:
+            group = self._buckets.get(key)
+            if group is None or group in seen:
+                continue
+            seen.add(group)
+            offset = self._signed[group] * self.num_perm
+            if sum(x == y for x, y in zip(signature, self._signatures[offset:offset + self.num_perm])) >= needed:
+                return group
+        return None
+
+    def _new_group(self, record):
+        self.representatives.append(record)
+        self._signed.append(-1)
+        return len(self.representatives) - 1
+
+    def _index(self, group, signature, keys):
+        # Each bucket remembers its first group only, which keeps the index at bands entries per group
+        self._signed[group] = len(self._signatures) // self.num_perm
+        self._signatures.extend(signature)
+        for key in keys:
+            self._buckets.setdefault(key, group)
+
+    def __len__(self):
+        return len(self.representatives)
+
+
+def dedup_records(records, mode="Near Duplicates", threshold=0.8):
+    # Returns (representatives, mapping) where mapping[i] is the index in representatives of records[i]
+    if mode == "Off":
+        records = list(records)
+        return records, list(range(len(records)))
+    deduplicator = PromptDeduplicator(threshold, near=mode == "Near Duplicates")
+    for record in records:
+        deduplicator.add(record)
+    return deduplicator.representatives, deduplicator.mapping.tolist()
+
+
+def fan_out(values, mapping):
+    # One value per original record from one value per representative
+    return [values[group] for group in mapping]
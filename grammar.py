@@ -0,0 +1,271 @@
+import functools
+import json
+import re
+from collections import deque
+
+_RULE_NAME_RE = re.compile(r"[^a-z0-9]+")
+_RULE_REF_RE = re.compile(r"[a-z][a-z0-9-]*")
+_PLACEHOLDER_RE = re.compile(r"^\[([^\[\]]*)\]$")
+
+# Shared terminals, following llama.cpp's grammars/json.gbnf
+JSON_PRIMITIVES = {
+    "ws": '([ \\t\\n] ws)?',
+    "string": '"\\"" ( [^"\\\\\\x7F\\x00-\\x1F] | "\\\\" (["\\\\bfnrt/] | "u" [0-9a-fA-F] [0-9a-fA-F] [0-9a-fA-F] [0-9a-fA-F]) )* "\\"" ws',
+    "number": '("-"? ([0-9] | [1-9] [0-9]*)) ("." [0-9]+)? ([eE] [-+]? [0-9]+)? ws',
+    "integer": '("-"? ([0-9] | [1-9] [0-9]*)) ws',
+    "boolean": '("true" | "false") ws',
+    "null": '"null" ws',
+}
+
+
+@functools.lru_cache(maxsize=4096)
+def literal(text):
+    # GBNF string literal
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\t", "\\t") + '"'
+
+
+def tree_from_paths(paths):
+    # Nested dicts/lists from leaf path parts, e.g. [("subject", "type"), ("color", 0)]; leaves are ""
+    root = {}
+    for parts in paths:
+        node = root
+        for position, part in enumerate(parts):
+            last = position == len(parts) - 1
+            child = "" if last else ([] if isinstance(parts[position + 1], int) else {})
+            if isinstance(part, int):
+                if not isinstance(node, list):
+                    break
+                node.extend([None] * (part + 1 - len(node)))
+                if node[part] is None:
+                    node[part] = child
+                node = node[part]
+            else:
+                if not isinstance(node, dict):
+                    break
+                if node.get(part) is None:
+                    node[part] = child
+                node = node[part]
+    return root
+
+
+def merge_items(items):
+    # One representative for the items of a list: objects are merged key by key, otherwise the first item wins.
+    # Breadth-first, so the first item still wins at every depth and deep schemas do not recurse.
+    if not items or not all(isinstance(item, dict) for item in items):
+        return items[0] if items else None
+    merged = {}
+    owned = {id(merged)}
+    queue = deque((merged, item) for item in items)
+    while queue:
+        target, source = queue.popleft()
+        for key, value in source.items():
+            if key not in target:
+                target[key] = value
+            elif isinstance(target[key], dict) and isinstance(value, dict):
+                # Copy before merging into a dict that still belongs to one of the items
+                if id(target[key]) not in owned:
+                    target[key] = dict(target[key])
+                    owned.add(id(target[key]))
+                queue.append((target[key], value))
+    return merged
+
+
+def _fold(root, children, combine):
+    # Post-order fold without recursion: combine(node, kids, results) gets the results for children(node)
+    results = []
+    stack = [(root, None)]
+    while stack:
+        node, kids = stack.pop()
+        if kids is None:
+            kids = children(node)
+            if kids:
+                stack.append((node, kids))
+                stack.extend((kid, None) for kid in reversed(kids))
+                continue
+        start = len(results) - len(kids)
+        values = results[start:]
+        del results[start:]
+        results.append(combine(node, kids, values))
+    return results[0]
+
+
+def _value_children(node):
+    # node is (value, hint); lists are described by one merged item
+    value, hint = node
+    if isinstance(value, dict):
+        return [(item, key) for key, item in value.items()]
+    if isinstance(value, (list, tuple)) and value:
+        return [(merge_items(list(value)), f"{hint}-item")]
+    return []
+
+
+def _leaf_schema(value):
+    if isinstance(value, bool):
+        return {"type": "boolean"}
+    if isinstance(value, int):
+        return {"type": "integer"}
+    if isinstance(value, float):
+        return {"type": "number"}
+    if isinstance(value, str):
+        match = _PLACEHOLDER_RE.match(value.strip())
+        description = match.group(1).strip() if match else value.strip()
+        return {"type": "string", "description": description} if description else {"type": "string"}
+    if value is None:
+        return {"type": "null"}
+    return {"type": "string"}
+
+
+def json_schema(value):
+    def combine(node, kids, results):
+        value = node[0]
+        if isinstance(value, dict):
+            return {
+                "type": "object",
+                "properties": dict(zip(value, results)),
+                "required": list(value),
+                "additionalProperties": False,
+            }
+        if isinstance(value, (list, tuple)):
+            return {"type": "array", "items": results[0]} if results else {"type": "array"}
+        return _leaf_schema(value)
+
+    return _fold((value, ""), _value_children, combine)
+
+
+class GrammarBuilder:
+    # Collects GBNF rules; identical rule bodies share one rule
+    def __init__(self):
+        self.rules = {}
+        self._names = {}
+        self._suffixes = {}
+
+    def add(self, hint, body):
+        name = self._names.get(body)
+        if name is not None:
+            return name
+        base = _RULE_NAME_RE.sub("-", hint.lower()).strip("-") or "rule"
+        # Resume from the last suffix handed out for this base instead of probing from the start each time
+        suffix = self._suffixes.get(base, 1)
+        name = base if suffix == 1 else f"{base}-{suffix}"
+        # "root" is written by render()
+        while name in self.rules or name in JSON_PRIMITIVES or name == "root":
+            suffix += 1
+            name = f"{base}-{suffix}"
+        self._suffixes[base] = suffix
+        self.rules[name] = body
+        self._names[body] = name
+        return name
+
+    def render(self, root, primitives=()):
+        lines = [f"root ::= {root}"]
+        lines.extend(f"{name} ::= {body}" for name, body in self.rules.items())
+        # Only the primitives some rule refers to; every primitive ends in ws
+        used = set(_RULE_REF_RE.findall(" ".join(lines)))
+        primitives = [name for name in primitives if name in used or name == "ws" and used & set(primitives)]
+        lines.extend(f"{name} ::= {JSON_PRIMITIVES[name]}" for name in primitives)
+        return "\n".join(lines)
+
+
+def json_gbnf(schema):
+    builder = GrammarBuilder()
+
+    def value_rule(node, kids, names):
+        value, hint = node
+        if isinstance(value, dict):
+            members = [f'{literal(json.dumps(key, ensure_ascii=False))} ws ":" ws {name}' for key, name in zip(value, names)]
+            return builder.add(hint, '"{" ws ' + ' "," ws '.join(members) + ' "}" ws' if members else '"{" ws "}" ws')
+        if isinstance(value, (list, tuple)):
+            if not value:
+                return builder.add(hint, '"[" ws "]" ws')
+            item = names[0]
+            return builder.add(hint, f'"[" ws ({item} ("," ws {item})*)? "]" ws')
+        if isinstance(value, bool):
+            return "boolean"
+        if isinstance(value, int):
+            return "integer"
+        if isinstance(value, float):
+            return "number"
+        if value is None:
+            return "null"
+        return "string"
+
+    root = _fold((schema, "object"), _value_children, value_rule)
+    return builder.render(f"ws {root}", JSON_PRIMITIVES)
+
+
+def html_gbnf(tree):
+    # One tag per line in schema order. Elements with children, and everything inside them, may repeat
+    # (several subjects, several colors); top-level fields such as the title appear once.
+    builder = GrammarBuilder()
+    builder.rules["indent"] = "[ \\t]*"
+    builder.rules["text"] = "[^<\\n]+"
+    if not tree:
+        # No tags in the schema: any well-formed tag lines, since GBNF cannot match closing tags to opening ones
+        builder.rules["tag"] = "[a-zA-Z_] [a-zA-Z0-9_-]*"
+        element = builder.add("element", 'indent "<" tag ">" (text | "\\n" element+ indent) "</" tag ">" "\\n"')
+        return builder.render(f"{element}+")
+
+    def children(node):
+        # node is (tag, value, hint); the root has no tag
+        tag, value, hint = node
+        if isinstance(value, list):
+            value = merge_items(value)
+        if not isinstance(value, dict):
+            return []
+        return [(child_tag, child, f"{hint}-{child_tag}" if tag else child_tag) for child_tag, child in value.items()]
+
+    def element(node, kids, names):
+        tag, value, hint = node
+        if tag is None:
+            return " ".join(name + ("+" if isinstance(kid[1], (dict, list)) else "") for kid, name in zip(kids, names))
+        if kids:
+            inner = " ".join(name + "+" for name in names)
+            return builder.add(hint, f'indent {literal(f"<{tag}>")} "\\n" {inner} indent {literal(f"</{tag}>")} "\\n"')
+        return builder.add(hint, f'indent {literal(f"<{tag}>")} text {literal(f"</{tag}>")} "\\n"')
+
+    return builder.render(_fold((None, tree, None), children, element))
+
+
+def key_gbnf(paths):
+    # "path: value" lines in any order. Every path segment may carry a list index, so "subject.type" in the
+    # schema also allows "subject[1].type".
+    builder = GrammarBuilder()
+    builder.rules["index"] = '"[" [0-9]+ "]"'
+    builder.rules["value"] = "[^\\n]+"
+    alternatives = {}
+    for parts in paths:
+        pieces = []
+        for position, part in enumerate(parts):
+            if isinstance(part, int):
+                pieces.append("index")
+                continue
+            pieces.append(literal(f".{part}" if pieces else part))
+            if position + 1 == len(parts) or not isinstance(parts[position + 1], int):
+                pieces.append("index?")
+        alternatives.setdefault(" ".join(pieces))
+    path = builder.add("path", " | ".join(f"({alternative})" for alternative in alternatives) or "[^:\\n]+")
+    line = builder.add("line", f'{path} ": " value "\\n"')
+    return builder.render(f"{line}+")
+
+
+def attribute_gbnf(names):
+    builder = GrammarBuilder()
+    builder.rules["value"] = "[^\\]\\n]+"
+    name = builder.add("name", " | ".join(literal(name) for name in dict.fromkeys(names)) or "[^:\\]\\n]+")
+    line = builder.add("line", f'"[" {name} ": " value "]" "\\n"')
+    return builder.render(f"{line}+")
+
+
+def schema_grammars(kind, schema, leaf_parts):
+    # (JSON Schema, GBNF grammar) for a schema of the given render kind. JSON-family schemas are described
+    # directly; for the line and tag formats the JSON Schema describes what PromptJSONParse makes of a response.
+    if kind == "JSON" and isinstance(schema, dict):
+        return json_schema(schema), json_gbnf(schema)
+    tree = tree_from_paths(leaf_parts)
+    if kind == "HTML":
+        return json_schema(tree), html_gbnf(tree)
+    if kind == "Key":
+        return json_schema(tree), key_gbnf(leaf_parts)
+    if kind == "Attribute-Based":
+        return json_schema(tree), attribute_gbnf(parts[0] for parts in leaf_parts)
+    return json_schema(tree), json_gbnf(tree)
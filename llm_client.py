@@ -0,0 +1,265 @@
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import ssl
+import threading
+from urllib.parse import urlsplit
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying: timeouts, rate limits and server-side failures
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    def __init__(self, message, status=None, retryable=False, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class _StaleConnection(Exception):
+    # A pooled keep-alive connection was closed by the server before it answered
+    pass
+
+
+class ConnectionPool:
+    # Keep-alive HTTP/1.1 connections to one host, reused across requests
+    def __init__(self, url, max_idle=8):
+        parts = urlsplit(url)
+        self.scheme = parts.scheme or "http"
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or (443 if self.scheme == "https" else 80)
+        self.max_idle = max_idle
+        self._ssl = ssl.create_default_context() if self.scheme == "https" else None
+        self._idle = []
+
+    async def acquire(self):
+        # Returns (reader, writer, reused)
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        reader, writer = await asyncio.open_connection(self.host, self.port, ssl=self._ssl)
+        return reader, writer, False
+
+    def release(self, reader, writer, keep_alive=True):
+        if keep_alive and len(self._idle) < self.max_idle and not writer.is_closing():
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+
+    def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+async def _read_body(reader, headers):
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";", 1)[0].strip() or b"0", 16)
+            if size == 0:
+                # Skip trailers up to the blank line that ends the message
+                while (await reader.readline()).strip():
+                    pass
+                return b"".join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+    if "content-length" in headers:
+        return await reader.readexactly(int(headers["content-length"]))
+    return await reader.read()
+
+
+def _retry_after(headers):
+    # Only the delay-seconds form of Retry-After is honoured
+    try:
+        return float(headers.get("retry-after", ""))
+    except ValueError:
+        return None
+
+
+class AsyncLLMClient:
+    # OpenAI-compatible chat completions client on asyncio streams. At most max_in_flight requests are
+    # sent at once; failed requests are retried with exponential backoff and full jitter, and identical
+    # requests that are in flight at the same time share one HTTP call.
+    def __init__(self, base_url, api_key="", max_in_flight=8, max_retries=3, timeout=120.0, backoff=0.5, max_backoff=30.0):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pool = ConnectionPool(self.base_url, max_idle=max_in_flight)
+        self._path = (urlsplit(self.base_url).path or "") + "/chat/completions"
+        self._semaphore = None
+        self._in_flight = {}
+
+    @staticmethod
+    def fingerprint(payload):
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    async def chat(self, system_prompt, user_prompt, model="", **params):
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": user_prompt})
+        payload = {"messages": messages, **{key: value for key, value in params.items() if value is not None}}
+        if model:
+            payload["model"] = model
+        response = await self.complete(payload)
+        try:
+            return response["choices"][0]["message"]["content"] or ""
+        except (KeyError, IndexError, TypeError):
+            raise LLMError(f"Unexpected response shape: {json.dumps(response)[:200]}")
+
+    async def complete(self, payload):
+        key = self.fingerprint(payload)
+        future = self._in_flight.get(key)
+        if future is not None:
+            metrics.increment("llm_coalesced")
+            return await asyncio.shield(future)
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await self._complete_with_retries(payload)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved in case nobody else was waiting for it
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._in_flight[key]
+
+    async def _complete_with_retries(self, payload):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    metrics.increment("llm_requests")
+                    with metrics.stage("llm_request"):
+                        status, headers, data = await asyncio.wait_for(self._post(body), self.timeout)
+                if status >= 400:
+                    raise LLMError(f"HTTP {status}: {data[:200].decode('utf-8', 'replace')}", status,
+                                   status in RETRYABLE_STATUSES, _retry_after(headers))
+                return json.loads(data)
+            except (LLMError, OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+                retryable = e.retryable if isinstance(e, LLMError) else not isinstance(e, ValueError)
+                if not retryable or attempt >= self.max_retries:
+                    metrics.increment("llm_failures")
+                    raise
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+                if isinstance(e, LLMError) and e.retry_after is not None:
+                    delay = max(delay, min(e.retry_after, self.max_backoff))
+                attempt += 1
+                metrics.increment("llm_retries")
+                logger.warning("LLM request failed (%s), retry %d/%d in %.2fs", e, attempt, self.max_retries, delay)
+                await asyncio.sleep(delay)
+
+    async def _post(self, body):
+        while True:
+            reader, writer, reused = await self.pool.acquire()
+            try:
+                return await self._exchange(reader, writer, body, reused)
+            except _StaleConnection:
+                # Not counted as a retry; the next attempt opens a new connection if none are idle
+                continue
+            except BaseException:
+                writer.close()
+                raise
+
+    async def _exchange(self, reader, writer, body, reused):
+        headers = [
+            f"POST {self._path} HTTP/1.1",
+            f"Host: {self.pool.host}:{self.pool.port}",
+            "Content-Type: application/json",
+            "Accept: application/json",
+            f"Content-Length: {len(body)}",
+            "Connection: keep-alive",
+        ]
+        if self.api_key:
+            headers.append(f"Authorization: Bearer {self.api_key}")
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body)
+        try:
+            await writer.drain()
+            status_line = await reader.readline()
+        except (ConnectionResetError, BrokenPipeError):
+            if reused:
+                writer.close()
+                raise _StaleConnection()
+            raise
+        if not status_line:
+            writer.close()
+            if reused:
+                raise _StaleConnection()
+            raise ConnectionResetError("Server closed the connection without a response")
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await reader.readline()
+            if not line.strip():
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+        data = await _read_body(reader, response_headers)
+        keep_alive = response_headers.get("connection", "").lower() != "close" and (
+            "content-length" in response_headers or "transfer-encoding" in response_headers)
+        self.pool.release(reader, writer, keep_alive)
+        return status, response_headers, data
+
+    async def chat_many(self, pairs, model="", **params):
+        # pairs: (system_prompt, user_prompt); returns one response text or LLMError/exception per pair, in order
+        return await asyncio.gather(*(self.chat(system_prompt, user_prompt, model, **params) for system_prompt, user_prompt in pairs),
+                                    return_exceptions=True)
+
+    def close(self):
+        self.pool.close()
+
+
+_loop = None
+_loop_lock = threading.Lock()
+_clients = {}
+
+
+def run(coroutine):
+    # Runs coroutine on a shared background event loop, so pooled connections outlive a single node execution
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="promptjson-llm", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coroutine, _loop).result()
+
+
+def get_client(base_url, api_key="", max_in_flight=8, max_retries=3, timeout=120.0):
+    key = (base_url.rstrip("/"), api_key, max_in_flight, max_retries, timeout)
+    with _loop_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = AsyncLLMClient(base_url, api_key, max_in_flight, max_retries, timeout)
+    return client
+
+
+def close_clients():
+    with _loop_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    if _loop is not None:
+        for client in clients:
+            _loop.call_soon_threadsafe(client.close)
@@ -0,0 +1,79 @@
+# Minimal OpenAI-compatible chat completions server for trying the dispatch node offline.
+#
+#   python llm_stub_server.py --port 8000 --latency 0.2 --fail-rate 0.1
+#
+# Every request is answered after --latency seconds with a small JSON document built from the last user
+# message; a --fail-rate fraction of requests get HTTP 503 instead, to exercise retries. Standard library only.
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    fail_rate = 0.0
+    requests = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.lock:
+            type(self).requests += 1
+        time.sleep(self.latency)
+        if random.random() < self.fail_rate:
+            self.reply(503, {"error": {"message": "stub server overloaded"}})
+            return
+        try:
+            payload = json.loads(body)
+            prompt = payload["messages"][-1]["content"]
+        except (ValueError, KeyError, IndexError):
+            self.reply(400, {"error": {"message": "expected a chat completions request"}})
+            return
+        content = json.dumps({"title": prompt[:60], "model": payload.get("model", "stub")})
+        self.reply(200, {
+            "id": f"stub-{self.requests}",
+            "object": "chat.completion",
+            "model": payload.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        })
+
+    def reply(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host="127.0.0.1", port=8000, latency=0.0, fail_rate=0.0):
+    StubHandler.latency = latency
+    StubHandler.fail_rate = fail_rate
+    return ThreadingHTTPServer((host, port), StubHandler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stub OpenAI-compatible chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before answering")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 503")
+    args = parser.parse_args(argv)
+    server = serve(args.host, args.port, args.latency, args.fail_rate)
+    print(f"Serving on http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+import atexit
+import contextlib
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Metrics:
+    # Process-wide counters and stage timings for the prompt pipeline. Disabled by default; when
+    # disabled and no hooks are registered, stage() and increment() return immediately.
+    def __init__(self):
+        self.enabled = False
+        self.dump_path = None
+        self.dump_interval = 10.0
+        self._hooks = []
+        self._caches = {}
+        self._counters = {}
+        self._timings = {}
+        self._observations = {}
+        self._last_dump = 0.0
+        self._dump_at_exit = False
+        self._lock = threading.Lock()
+
+    @property
+    def active(self):
+        return self.enabled or bool(self._hooks)
+
+    def enable(self, dump_path=None, dump_interval=None):
+        self.enabled = True
+        if dump_path is not None:
+            self.dump_path = dump_path
+        if dump_interval is not None:
+            self.dump_interval = dump_interval
+        if self.dump_path and not self._dump_at_exit:
+            atexit.register(self.maybe_dump, force=True)
+            self._dump_at_exit = True
+
+    def disable(self):
+        self.enabled = False
+
+    def add_hook(self, hook):
+        # hook(kind, name, value) with kind "timing" (seconds), "counter" (increment) or "observation"
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self._hooks.remove(hook)
+
+    def register_cache(self, name, info_fn):
+        # info_fn returns an object with hits, misses and currsize (LRUCache.info or functools cache_info)
+        self._caches[name] = info_fn
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if not self.active:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record("timing", name, time.perf_counter() - start)
+
+    def increment(self, name, amount=1):
+        if self.active:
+            self._record("counter", name, amount)
+
+    def observe(self, name, value):
+        if self.active:
+            self._record("observation", name, value)
+
+    def _record(self, kind, name, value):
+        for hook in self._hooks:
+            try:
+                hook(kind, name, value)
+            except Exception:
+                logger.exception("Metrics hook failed")
+        if not self.enabled:
+            return
+        with self._lock:
+            if kind == "counter":
+                self._counters[name] = self._counters.get(name, 0) + value
+            else:
+                table = self._timings if kind == "timing" else self._observations
+                count, total, maximum = table.get(name, (0, 0.0, 0.0))
+                table[name] = (count + 1, total + value, max(maximum, value))
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+            self._observations.clear()
+
+    def snapshot(self):
+        with self._lock:
+            snapshot = {
+                "counters": dict(self._counters),
+                "stages": {name: {"count": c, "total_seconds": t, "max_seconds": m}
+                           for name, (c, t, m) in self._timings.items()},
+                "observations": {name: {"count": c, "sum": t, "max": m}
+                                 for name, (c, t, m) in self._observations.items()},
+            }
+        caches = {}
+        for name, info_fn in self._caches.items():
+            info = info_fn()
+            lookups = info.hits + info.misses
+            caches[name] = {"hits": info.hits, "misses": info.misses, "size": info.currsize,
+                            "hit_rate": info.hits / lookups if lookups else 0.0}
+        snapshot["caches"] = caches
+        return snapshot
+
+    def to_openmetrics(self):
+        snapshot = self.snapshot()
+        lines = []
+
+        def family(name, metric_type, help_text, samples):
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.append(f"# HELP {name} {help_text}")
+            lines.extend(samples)
+
+        if snapshot["stages"]:
+            samples = []
+            for stage, values in sorted(snapshot["stages"].items()):
+                samples.append(f'promptjson_stage_seconds_count{{stage="{stage}"}} {values["count"]}')
+                samples.append(f'promptjson_stage_seconds_sum{{stage="{stage}"}} {values["total_seconds"]:.9f}')
+            family("promptjson_stage_seconds", "summary", "Time spent in each prompt pipeline stage.", samples)
+        for name, value in sorted(snapshot["counters"].items()):
+            family(f"promptjson_{name}", "counter", f"Total {name.replace('_', ' ')}.",
+                   [f"promptjson_{name}_total {value}"])
+        if snapshot["observations"]:
+            samples = []
+            for name, values in sorted(snapshot["observations"].items()):
+                samples.append(f'promptjson_output_size_count{{output="{name}"}} {values["count"]}')
+                samples.append(f'promptjson_output_size_sum{{output="{name}"}} {values["sum"]}')
+            family("promptjson_output_size", "summary", "Size of generated outputs in characters.", samples)
+        if snapshot["caches"]:
+            hits, misses, sizes = [], [], []
+            for name, values in sorted(snapshot["caches"].items()):
+                hits.append(f'promptjson_cache_hits_total{{cache="{name}"}} {values["hits"]}')
+                misses.append(f'promptjson_cache_misses_total{{cache="{name}"}} {values["misses"]}')
+                sizes.append(f'promptjson_cache_entries{{cache="{name}"}} {values["size"]}')
+            family("promptjson_cache_hits", "counter", "Cache lookups that were hits.", hits)
+            family("promptjson_cache_misses", "counter", "Cache lookups that were misses.", misses)
+            family("promptjson_cache_entries", "gauge", "Entries currently held by each cache.", sizes)
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path=None):
+        path = path or self.dump_path
+        if not path:
+            return
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.to_openmetrics())
+        os.replace(tmp_path, path)
+        self._last_dump = time.monotonic()
+
+    def maybe_dump(self, force=False):
+        # Called after each execution; writes the metrics file at most once per dump_interval
+        if self.enabled and self.dump_path and (force or time.monotonic() - self._last_dump >= self.dump_interval):
+            try:
+                self.dump()
+            except OSError as e:
+                logger.error("Could not write metrics to %s: %s", self.dump_path, e)
+
+
+metrics = Metrics()
+if os.environ.get("PROMPTJSON_METRICS", "").lower() in ("1", "true", "yes") or os.environ.get("PROMPTJSON_METRICS_FILE"):
+    metrics.enable(os.environ.get("PROMPTJSON_METRICS_FILE"))
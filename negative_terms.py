@@ -0,0 +1,138 @@
+import re
+from collections import deque
+from .caching import LRUCache, content_hash
+from .compiled_schema import format_path, iter_json_leaves
+from .metrics import metrics
+
+_SPLIT_RE = re.compile(r"[,\n;]+")
+# Stable Diffusion emphasis syntax: (term:1.3), [term], ((term))
+_WEIGHT_RE = re.compile(r":\s*-?\d+(?:\.\d+)?\s*$")
+_BRACKETS = str.maketrans("", "", "()[]{}")
+_SIBILANT_ENDINGS = ("s", "x", "z", "ch", "sh")
+# Endings of singular words that end in "s" (glass, bus, iris, canvas); they only get an "es" plural
+_SINGULAR_S_ENDINGS = ("ss", "us", "is", "as")
+# "es" plurals whose singular drops the whole "es" (boxes, churches, buses); otherwise only the "s" goes (horses)
+_ES_STEM_ENDINGS = ("x", "ch", "sh") + _SINGULAR_S_ENDINGS
+# Exceptions to the suffix rules
+_SINGULAR_S_WORDS = frozenset({"lens", "yes", "this"})
+_INVARIANT_WORDS = frozenset({"news", "series", "species", "chaos", "cosmos", "physics", "clothes", "scissors"})
+
+
+def parse_terms(negative_prompt):
+    # Distinct, case-folded terms of a comma-separated negative prompt, in order
+    terms = []
+    for part in _SPLIT_RE.split(negative_prompt or ""):
+        term = " ".join(_WEIGHT_RE.sub("", part.translate(_BRACKETS)).casefold().split())
+        if term and term not in terms:
+            terms.append(term)
+    return terms
+
+
+def term_variants(term):
+    # The term plus simple singular/plural forms of its last word
+    head, _, word = term.rpartition(" ")
+    forms = {word}
+    if word in _INVARIANT_WORDS:
+        pass
+    elif word.endswith("s") and not word.endswith(_SINGULAR_S_ENDINGS) and word not in _SINGULAR_S_WORDS:
+        # Already plural: add the singular, except for short words such as "res"
+        if word.endswith("ies") and len(word) > 4:
+            forms.add(word[:-3] + "y")
+        elif word.endswith("es") and (word[:-2].endswith(_ES_STEM_ENDINGS) or word[:-2] in _SINGULAR_S_WORDS):
+            forms.add(word[:-2])
+        elif len(word) > 3:
+            forms.add(word[:-1])
+    elif word.endswith("y") and len(word) > 1 and word[-2] not in "aeiou":
+        forms.add(word[:-1] + "ies")
+    elif word.endswith(_SIBILANT_ENDINGS):
+        forms.add(word + "es")
+    else:
+        forms.add(word + "s")
+    return sorted(f"{head} {form}" if head else form for form in forms)
+
+
+def _is_word(char):
+    return char.isalnum() or char == "_"
+
+
+class NegativeTermScanner:
+    # Aho-Corasick automaton over every variant of the negative terms. scan() finds all whole-word
+    # occurrences in one pass over the text, however many terms there are.
+    def __init__(self, negative_prompt):
+        self.terms = parse_terms(negative_prompt)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for index, term in enumerate(self.terms):
+            for variant in term_variants(term):
+                self._insert(variant, index)
+        self._link()
+
+    def _insert(self, pattern, index):
+        state = 0
+        for char in pattern:
+            following = self._goto[state].get(char)
+            if following is None:
+                following = self._goto[state][char] = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = following
+        self._out[state] += ((len(pattern), index),)
+
+    def _link(self):
+        # Breadth-first failure links; each state also reports the matches of its failure state
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in self._goto[state].items():
+                queue.append(following)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[following] = self._goto[fail].get(char, 0)
+                self._out[following] += self._out[self._fail[following]]
+
+    def scan(self, text):
+        # Distinct terms found in text as whole words, in order of first occurrence. Whitespace runs and
+        # case do not matter.
+        if not self.terms or not text:
+            return []
+        text = " ".join(text.casefold().split())
+        goto, fail, out = self._goto, self._fail, self._out
+        found = []
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                end = position + 1
+                for length, index in out[state]:
+                    start = end - length
+                    if (start == 0 or not _is_word(text[start - 1])) and (end == len(text) or not _is_word(text[end])):
+                        if self.terms[index] not in found:
+                            found.append(self.terms[index])
+        return found
+
+    def scan_fields(self, data):
+        # (path, term) for every string field of a parsed response that contains a negative term
+        hits = []
+        for parts, value in iter_json_leaves(data):
+            if isinstance(value, str):
+                path = format_path(parts)
+                hits.extend((path, term) for term in self.scan(value))
+        return hits
+
+
+# Compiled scanners keyed by content hash of the negative prompt
+scanner_cache = LRUCache(maxsize=256)
+metrics.register_cache("negative_scanner", scanner_cache.info)
+
+
+def get_scanner(negative_prompt):
+    key = content_hash(negative_prompt)
+    scanner = scanner_cache.get(key)
+    if scanner is None:
+        scanner = scanner_cache.put(key, NegativeTermScanner(negative_prompt))
+    return scanner
@@ -0,0 +1,353 @@
+# Indexed prompt-set files: generated prompts packed for fast random access by trainers.
+#
+#   python prompt_set.py convert prompts.jsonl prompts.pjset --compression zlib
+#   python prompt_set.py info prompts.pjset
+#   python prompt_set.py get prompts.pjset 42
+#
+# Layout: a 32-byte header, the user prompt blob (raw or in compressed blocks of block_records records),
+# the offset index and per-record tables, the shared-string blob, and a JSON footer describing every
+# section. System prompts, schemas and negative prompts are stored once and referenced by index.
+# Compressed blocks share a preset dictionary (the end of the first user prompt), so the template text
+# every user prompt repeats compresses well even in small blocks, and a random read decompresses little.
+# Standard library only (zstd needs the optional zstandard package), so the file can be copied into
+# training code as is.
+import argparse
+import json
+import mmap
+import os
+import sys
+import zlib
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from struct import Struct
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC = b"PJPROMPT"
+VERSION = 1
+HEADER = Struct("<8sHHIQQ")
+# zlib's window size; longer dictionaries are cut to their end
+MAX_DICTIONARY = 32768
+COMPRESSIONS = ["zlib", "none", "zstd"]
+
+
+def _zstd_dictionary(dictionary):
+    return zstandard.ZstdCompressionDict(dictionary, dict_type=zstandard.DICT_TYPE_RAWCONTENT) if dictionary else None
+
+
+class PromptSetWriter:
+    # Records must be added in increasing record_id order; ids default to the record position
+    def __init__(self, path, compression="zlib", block_records=16, level=6):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unsupported compression: {compression}")
+        if compression == "zstd" and zstandard is None:
+            raise ValueError("zstd compression needs the zstandard package")
+        self.path = path
+        self.compression = compression
+        self.block_records = block_records
+        self.level = level
+        self._tmp_path = path + ".tmp"
+        self._file = open(self._tmp_path, "wb")
+        self._file.write(bytes(HEADER.size))
+        self._dictionary = None
+        self._zstd = None
+        self._shared = {}
+        self._shared_blob = bytearray()
+        self._shared_offsets = array("Q", [0])
+        self._offsets = array("Q", [0])
+        self._fields = array("I")
+        self._ids = array("Q")
+        self._contiguous = True
+        self._blocks = array("Q", [HEADER.size])
+        self._pending = []
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _intern(self, text):
+        index = self._shared.get(text)
+        if index is None:
+            index = self._shared[text] = len(self._shared)
+            self._shared_blob += (text or "").encode("utf-8")
+            self._shared_offsets.append(len(self._shared_blob))
+        return index
+
+    def add(self, system_prompt, user_prompt, negative_prompt="", schema="", record_id=None):
+        position = len(self._ids)
+        if record_id is None:
+            record_id = self._ids[-1] + 1 if self._ids else 0
+        elif self._ids and record_id <= self._ids[-1]:
+            raise ValueError(f"Record ids must increase: {record_id} after {self._ids[-1]}")
+        self._contiguous = self._contiguous and record_id == position
+        self._ids.append(record_id)
+        self._fields.extend((self._intern(system_prompt), self._intern(schema), self._intern(negative_prompt)))
+        data = (user_prompt or "").encode("utf-8")
+        self._offsets.append(self._offsets[-1] + len(data))
+        if self.compression == "none":
+            self._file.write(data)
+            return
+        if self._dictionary is None:
+            self._dictionary = data[-MAX_DICTIONARY:]
+        self._pending.append(data)
+        if len(self._pending) == self.block_records:
+            self._flush_block()
+
+    def _flush_block(self):
+        if not self._pending:
+            return
+        data = b"".join(self._pending)
+        if self.compression == "zstd":
+            if self._zstd is None:
+                self._zstd = zstandard.ZstdCompressor(level=self.level, dict_data=_zstd_dictionary(self._dictionary))
+            self._file.write(self._zstd.compress(data))
+        else:
+            compressor = zlib.compressobj(self.level, zdict=self._dictionary) if self._dictionary else zlib.compressobj(self.level)
+            self._file.write(compressor.compress(data) + compressor.flush())
+        self._blocks.append(self._file.tell())
+        self._pending = []
+
+    def _section(self, sections, name, data):
+        # Sections start on 8-byte boundaries so the index arrays can be cast in place
+        self._file.write(bytes(-self._file.tell() % 8))
+        sections[name] = [self._file.tell(), len(data)]
+        self._file.write(data)
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._flush_block()
+        sections = {"user_prompts": [HEADER.size, self._file.tell() - HEADER.size]}
+        if self.compression != "none":
+            self._section(sections, "blocks", self._blocks.tobytes())
+            self._section(sections, "dictionary", self._dictionary or b"")
+        self._section(sections, "offsets", self._offsets.tobytes())
+        self._section(sections, "fields", self._fields.tobytes())
+        if not self._contiguous:
+            self._section(sections, "ids", self._ids.tobytes())
+        self._section(sections, "shared", bytes(self._shared_blob))
+        self._section(sections, "shared_offsets", self._shared_offsets.tobytes())
+        meta = json.dumps({
+            "version": VERSION,
+            "records": len(self._ids),
+            "shared_strings": len(self._shared),
+            "compression": self.compression,
+            "block_records": self.block_records,
+            "byteorder": sys.byteorder,
+            "sections": sections,
+        }).encode("utf-8")
+        meta_offset = self._file.tell()
+        self._file.write(meta)
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, VERSION, 0, 0, meta_offset, len(meta)))
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        self._file.close()
+        os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class PromptSet:
+    # Read-only view of a prompt-set file over mmap. Opening reads only the header and footer; the index
+    # arrays are memoryviews into the mapping, and records are decoded on access.
+    def __init__(self, path, cache_blocks=8):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        magic, version, _, _, meta_offset, meta_length = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"Not a prompt-set file: {path}")
+        if version > VERSION:
+            self.close()
+            raise ValueError(f"Prompt-set version {version} is newer than this reader ({VERSION})")
+        self.meta = json.loads(self._mmap[meta_offset:meta_offset + meta_length])
+        if self.meta["byteorder"] != sys.byteorder:
+            self.close()
+            raise ValueError(f"Prompt set was written on a {self.meta['byteorder']}-endian machine")
+        self.compression = self.meta["compression"]
+        if self.compression == "zstd" and zstandard is None:
+            self.close()
+            raise ValueError("Reading zstd prompt sets needs the zstandard package")
+        self._block_records = self.meta["block_records"]
+        sections = self.meta["sections"]
+        self._user_start = sections["user_prompts"][0]
+        self._offsets = self._array(sections["offsets"], "Q")
+        self._fields = self._array(sections["fields"], "I")
+        self._ids = self._array(sections["ids"], "Q") if "ids" in sections else None
+        self._blocks = self._array(sections["blocks"], "Q") if "blocks" in sections else None
+        self._dictionary = bytes(self._view[sections["dictionary"][0]:sum(sections["dictionary"])]) if "dictionary" in sections else b""
+        if self.compression == "zstd":
+            self._decompressor = zstandard.ZstdDecompressor(dict_data=_zstd_dictionary(self._dictionary))
+        self._shared_start = sections["shared"][0]
+        self._shared_offsets = self._array(sections["shared_offsets"], "Q")
+        self._shared_cache = {}
+        self._block_cache = OrderedDict()
+        self._cache_blocks = cache_blocks
+
+    def _array(self, section, typecode):
+        offset, length = section
+        return self._view[offset:offset + length].cast(typecode)
+
+    def __len__(self):
+        return len(self._fields) // 3
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    def close(self):
+        # Views returned by user_prompt_bytes() should be released first. While one is alive the mapping
+        # cannot be closed; it is then left to the garbage collector, and the file is closed regardless.
+        try:
+            for name in ("_offsets", "_fields", "_ids", "_blocks", "_shared_offsets", "_view"):
+                view = getattr(self, name, None)
+                if view is not None:
+                    view.release()
+                    setattr(self, name, None)
+            self._block_cache = OrderedDict()
+            if not self._mmap.closed:
+                try:
+                    self._mmap.close()
+                except BufferError:
+                    pass
+        finally:
+            self._file.close()
+
+    def shared(self, index):
+        # Shared strings are few and long, so each is decoded once
+        text = self._shared_cache.get(index)
+        if text is None:
+            start = self._shared_start + self._shared_offsets[index]
+            end = self._shared_start + self._shared_offsets[index + 1]
+            text = self._shared_cache[index] = str(self._view[start:end], "utf-8")
+        return text
+
+    def _block(self, block):
+        data = self._block_cache.get(block)
+        if data is not None:
+            self._block_cache.move_to_end(block)
+            return data
+        compressed = self._view[self._blocks[block]:self._blocks[block + 1]]
+        if self.compression == "zstd":
+            data = self._decompressor.decompress(compressed)
+        else:
+            decompressor = zlib.decompressobj(zdict=self._dictionary) if self._dictionary else zlib.decompressobj()
+            data = decompressor.decompress(compressed)
+        compressed.release()
+        self._block_cache[block] = data
+        if len(self._block_cache) > self._cache_blocks:
+            self._block_cache.popitem(last=False)
+        return data
+
+    def user_prompt_bytes(self, index):
+        # UTF-8 bytes of a user prompt: a zero-copy memoryview into the file when uncompressed
+        index = self._position(index)
+        if self._blocks is None:
+            return self._view[self._user_start + self._offsets[index]:self._user_start + self._offsets[index + 1]]
+        block = index // self._block_records
+        base = self._offsets[block * self._block_records]
+        return memoryview(self._block(block))[self._offsets[index] - base:self._offsets[index + 1] - base]
+
+    def user_prompt(self, index):
+        return str(self.user_prompt_bytes(index), "utf-8")
+
+    def _position(self, index):
+        count = len(self)
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError("prompt set index out of range")
+        return index
+
+    def record_id(self, index):
+        index = self._position(index)
+        return self._ids[index] if self._ids is not None else index
+
+    def index_of(self, record_id):
+        if self._ids is None:
+            if 0 <= record_id < len(self):
+                return record_id
+        else:
+            index = bisect_left(self._ids, record_id)
+            if index < len(self._ids) and self._ids[index] == record_id:
+                return index
+        raise KeyError(record_id)
+
+    def __getitem__(self, index):
+        # Records in the same shape as the stream node's JSONL lines
+        index = self._position(index)
+        system_prompt, schema, negative_prompt = (self.shared(shared) for shared in self._fields[index * 3:index * 3 + 3])
+        return {
+            "id": self.record_id(index),
+            "system_prompt": system_prompt,
+            "user_prompt": self.user_prompt(index),
+            "negative_prompt": negative_prompt,
+            "schema": schema,
+        }
+
+    def get(self, record_id):
+        return self[self.index_of(record_id)]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+def convert_jsonl(input_path, output_path, compression="zlib", block_records=16):
+    # Packs the stream node's JSONL output into a prompt set; returns the number of records
+    with open(input_path, "r", encoding="utf-8") as f, PromptSetWriter(output_path, compression, block_records) as writer:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            writer.add(record.get("system_prompt", ""), record.get("user_prompt", ""), record.get("negative_prompt", ""),
+                       record.get("schema", ""), record.get("id"))
+        return len(writer)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create and inspect indexed prompt-set files")
+    commands = parser.add_subparsers(dest="command", required=True)
+    convert = commands.add_parser("convert", help="pack a JSONL file from the stream node into a prompt set")
+    convert.add_argument("input")
+    convert.add_argument("output")
+    convert.add_argument("--compression", choices=COMPRESSIONS, default="zlib")
+    convert.add_argument("--block-records", type=int, default=16, help="user prompts per compressed block")
+    info = commands.add_parser("info", help="print the footer of a prompt set")
+    info.add_argument("path")
+    get = commands.add_parser("get", help="print one record as JSON")
+    get.add_argument("path")
+    get.add_argument("record_id", type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        count = convert_jsonl(args.input, args.output, args.compression, args.block_records)
+        print(f"Wrote {count} records to {args.output} ({os.path.getsize(args.output)} bytes)")
+        return 0
+    with PromptSet(args.path) as prompt_set:
+        if args.command == "info":
+            print(json.dumps(prompt_set.meta, indent=2))
+        else:
+            print(json.dumps(prompt_set.get(args.record_id), indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,26 @@
+import json
+
+
+def normalize_record(record):
+    # A prompt record as PromptJSON.iter_batch expects it: a "prompt" string, optional "negative_prompt" and
+    # "custom_schema" strings and a float "complexity", without empty values. A bare string is a prompt.
+    # Returns None when there is no prompt; raises ValueError or TypeError for unusable field values.
+    if isinstance(record, str):
+        return {"prompt": record}
+    if not isinstance(record, dict) or not isinstance(record.get("prompt"), str):
+        return None
+    record = {key: value for key, value in record.items() if value not in (None, "")}
+    record.setdefault("prompt", "")
+    if "complexity" in record:
+        if isinstance(record["complexity"], (list, dict, bool)):
+            raise TypeError(f"complexity must be a number, not {type(record['complexity']).__name__}")
+        record["complexity"] = float(record["complexity"])
+    schema = record.get("custom_schema")
+    if isinstance(schema, (dict, list)):
+        # A JSON custom schema given inline rather than as text
+        record["custom_schema"] = json.dumps(schema, ensure_ascii=False)
+    elif schema is not None and not isinstance(schema, str):
+        raise TypeError(f"custom_schema must be a string or a JSON object, not {type(schema).__name__}")
+    if not isinstance(record.get("negative_prompt", ""), str):
+        raise TypeError(f"negative_prompt must be a string, not {type(record['negative_prompt']).__name__}")
+    return record
@@ -0,0 +1,209 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from .caching import CacheInfo
+from .config import env_number
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+def _default_path():
+    # ComfyUI's user directory when running inside ComfyUI, so the cache stays out of the node's git checkout
+    try:
+        import folder_paths
+        return os.path.join(folder_paths.get_user_directory(), "promptjson", "responses.sqlite3")
+    except (ImportError, AttributeError):
+        return os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "responses.sqlite3")
+
+
+DEFAULT_PATH = _default_path()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def response_key(system_prompt, user_prompt, namespace=""):
+    # Length-prefixed so that moving text between the two prompts changes the key
+    digest = hashlib.sha256()
+    for part in (namespace or "", system_prompt or "", user_prompt or ""):
+        data = part.encode("utf-8")
+        digest.update(len(data).to_bytes(8, "little"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class ResponseStore:
+    # LLM responses in an SQLite database in WAL mode, so several ComfyUI processes can read and write the
+    # same cache at once. Entries older than max_age seconds are dropped; beyond max_entries or max_bytes,
+    # the least recently used entries are evicted. Hit and miss counts are stored alongside and shared too.
+    def __init__(self, path=DEFAULT_PATH, max_entries=100000, max_bytes=512 * 1024 * 1024, max_age=30 * 24 * 3600,
+                 evict_every=64, timeout=30.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.evict_every = evict_every
+        self.timeout = timeout
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+        self.evict()
+
+    def _connection(self):
+        # One connection per thread; sqlite3 connections must not be shared between threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def __contains__(self, key):
+        # Does not touch the entry or the hit/miss counters
+        row = self._connection().execute("SELECT created FROM responses WHERE key = ?", (key,)).fetchone()
+        return row is not None and (self.max_age is None or row[0] >= time.time() - self.max_age)
+
+    def get(self, key):
+        connection = self._connection()
+        now = time.time()
+        row = connection.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is not None and self.max_age is not None and row[1] < now - self.max_age:
+            connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            row = None
+        if row is None:
+            self._count("misses")
+            metrics.increment("response_cache_misses")
+            return None
+        connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        self._count("hits")
+        metrics.increment("response_cache_hits")
+        return row[0]
+
+    def put(self, key, response):
+        now = time.time()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO responses (key, response, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+            (key, response, len(response.encode("utf-8")), now, now))
+        with self._lock:
+            self._writes += 1
+            due = self._writes % self.evict_every == 0
+        if due:
+            self.evict()
+        return response
+
+    def lookup(self, system_prompt, user_prompt, namespace=""):
+        return self.get(response_key(system_prompt, user_prompt, namespace))
+
+    def store(self, system_prompt, user_prompt, response, namespace=""):
+        return self.put(response_key(system_prompt, user_prompt, namespace), response)
+
+    def evict(self):
+        # Expired entries first, then least recently used ones until both limits hold. Returns the number removed.
+        connection = self._connection()
+        removed = 0
+        with self._lock:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                if self.max_age is not None:
+                    removed += connection.execute("DELETE FROM responses WHERE created < ?",
+                                                  (time.time() - self.max_age,)).rowcount
+                count, total = connection.execute("SELECT COUNT(*), TOTAL(size) FROM responses").fetchone()
+                excess = max(0, count - self.max_entries) if self.max_entries is not None else 0
+                if self.max_bytes is not None and total > self.max_bytes:
+                    # Walk entries from least recently used until enough bytes are freed
+                    freed = 0
+                    for position, (size,) in enumerate(connection.execute("SELECT size FROM responses ORDER BY accessed")):
+                        if freed >= total - self.max_bytes:
+                            excess = max(excess, position)
+                            break
+                        freed += size
+                    else:
+                        excess = count
+                if excess:
+                    removed += connection.execute(
+                        "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                        (excess,)).rowcount
+                if removed:
+                    self._count("evictions", removed)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        if removed:
+            logger.debug("Evicted %d cached responses from %s", removed, self.path)
+        return removed
+
+    def _count(self, name, amount=1):
+        self._connection().execute(
+            "INSERT INTO stats (name, value) VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+            (name, amount))
+
+    def stats(self):
+        connection = self._connection()
+        count, total = connection.execute("SELECT COUNT(*), TOTAL(size) FROM responses").fetchone()
+        counters = dict(connection.execute("SELECT name, value FROM stats").fetchall())
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "entries": count,
+            "bytes": int(total),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "evictions": counters.get("evictions", 0),
+            "path": self.path,
+        }
+
+    def info(self):
+        stats = self.stats()
+        return CacheInfo(stats["hits"], stats["misses"], self.max_entries, stats["entries"])
+
+    def clear(self):
+        connection = self._connection()
+        connection.execute("DELETE FROM responses")
+        connection.execute("DELETE FROM stats")
+
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path=None):
+    # Shared store per database path; settings come from the environment
+    path = path or os.environ.get("PROMPTJSON_RESPONSE_CACHE", DEFAULT_PATH)
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = ResponseStore(
+                path,
+                max_entries=env_number("PROMPTJSON_RESPONSE_CACHE_MAX_ENTRIES", 100000),
+                max_bytes=int(env_number("PROMPTJSON_RESPONSE_CACHE_MAX_MB", 512.0, float) * 1024 * 1024),
+                max_age=env_number("PROMPTJSON_RESPONSE_CACHE_MAX_AGE_DAYS", 30.0, float) * 24 * 3600,
+            )
+            metrics.register_cache("response_store", store.info)
+    return store
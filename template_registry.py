@@ -0,0 +1,163 @@
+import copy
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from .config import env_number
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+TEMPLATE_EXTENSIONS = (".json", ".yaml", ".yml")
+# Example tiers the One Shot and Few Shot system prompts use; every template needs an example for each
+REQUIRED_TIERS = ("low", "medium", "high")
+
+Template = namedtuple("Template", ["schema_type", "render_as", "default_schema", "examples", "order", "source"])
+TemplateSet = namedtuple("TemplateSet", ["templates", "schema_types", "example_tiers", "version", "stamp"])
+
+_EMPTY = TemplateSet({}, [], {}, "", None)
+
+
+def _load_yaml(path):
+    if importlib.util.find_spec("yaml") is None:
+        raise ValueError("PyYAML is not installed")
+    import yaml
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
+def _lines(value):
+    # Multi-line text can be written as a list of lines to keep template files readable
+    return "\n".join(value) if isinstance(value, list) else value
+
+
+def parse_template(document, source):
+    schema_type = document["schema_type"]
+    if "default_schema_text" in document:
+        default_schema = _lines(document["default_schema_text"])
+    else:
+        default_schema = document["default_schema"]
+    examples = {tier: _lines(output) for tier, output in document.get("examples", {}).items()}
+    missing = [tier for tier in REQUIRED_TIERS if tier not in examples]
+    if missing:
+        raise ValueError(f"{schema_type} has no examples for tiers {', '.join(missing)}")
+    return Template(schema_type, document.get("render_as", "JSON"), default_schema, examples,
+                    document.get("order", 1000), source)
+
+
+class TemplateRegistry:
+    # Schema templates and examples loaded from *.json / *.yaml files. Later directories override earlier
+    # ones per schema type. Files are re-read when their mtime or size changes; a reload builds a complete
+    # new TemplateSet and swaps it in with a single assignment, so readers never see a half-loaded registry.
+    def __init__(self, directories, check_interval=1.0):
+        self.directories = list(directories)
+        self.check_interval = check_interval
+        self._current = _EMPTY
+        self._next_check = 0.0
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener):
+        # listener() is called after every reload that changed the templates
+        self._listeners.append(listener)
+
+    def current(self):
+        # A negative check_interval turns hot reload off after the first load
+        if self._current.stamp is None or (self.check_interval >= 0 and time.monotonic() >= self._next_check):
+            self.refresh()
+        return self._current
+
+    def get(self, schema_type):
+        template = self.current().templates.get(schema_type)
+        if template is None:
+            raise ValueError(f"Unsupported schema type: {schema_type}")
+        return template
+
+    def default_schema(self, schema_type):
+        # A fresh copy per call, so callers may modify it
+        return copy.deepcopy(self.get(schema_type).default_schema)
+
+    def schema_types(self):
+        return self.current().schema_types
+
+    def version(self):
+        return self.current().version
+
+    def _files(self):
+        files = []
+        for directory in self.directories:
+            try:
+                entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.name.endswith(TEMPLATE_EXTENSIONS) and entry.is_file():
+                    stat = entry.stat()
+                    files.append((entry.path, stat.st_mtime_ns, stat.st_size))
+        return tuple(files)
+
+    def refresh(self, force=False):
+        # Cheap when nothing changed: one directory listing and a stat per file
+        if not self._lock.acquire(blocking=not self._current.stamp):
+            return False
+        try:
+            self._next_check = time.monotonic() + self.check_interval
+            stamp = self._files()
+            if not force and stamp == self._current.stamp:
+                return False
+            self._current = self._load(stamp)
+        finally:
+            self._lock.release()
+        logger.info("Loaded %d schema templates from %d files", len(self._current.templates), len(stamp))
+        for listener in self._listeners:
+            listener()
+        return True
+
+    def _load(self, stamp):
+        previous = self._current
+        templates = {}
+        example_tiers = {}
+        digest = hashlib.sha1()
+        for path, _, _ in stamp:
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                if path.endswith(".json"):
+                    document = json.loads(data)
+                else:
+                    document = _load_yaml(path)
+                if not isinstance(document, dict):
+                    raise ValueError("expected a mapping at the top level")
+                template = parse_template(document, path) if "schema_type" in document else None
+            except Exception as e:
+                # Keep serving what this file defined before rather than dropping its schema type
+                logger.error("Invalid template file %s: %s", path, e)
+                for schema_type, template in previous.templates.items():
+                    if template.source == path:
+                        templates[schema_type] = template
+                continue
+            digest.update(path.encode("utf-8"))
+            digest.update(data)
+            if template is not None:
+                templates[template.schema_type] = template
+            example_tiers.update(document.get("example_tiers", {}))
+        missing = [tier for tier in REQUIRED_TIERS if tier not in example_tiers]
+        if example_tiers and missing:
+            logger.error("Example tiers %s are not defined; keeping the previous example tiers", ", ".join(missing))
+            example_tiers = {}
+        schema_types = [template.schema_type for template in sorted(templates.values(), key=lambda t: t.order)]
+        return TemplateSet(templates, schema_types, example_tiers or previous.example_tiers, digest.hexdigest(), stamp)
+
+
+def template_directories():
+    directories = [TEMPLATES_DIR]
+    extra = os.environ.get("PROMPTJSON_TEMPLATE_DIRS", "")
+    directories.extend(directory for directory in extra.split(os.pathsep) if directory)
+    return directories
+
+
+registry = TemplateRegistry(template_directories(), env_number("PROMPTJSON_TEMPLATE_RELOAD_INTERVAL", 1.0, float))
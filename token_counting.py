@@ -0,0 +1,60 @@
+import importlib.util
+import logging
+import re
+from .caching import LRUCache
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+_tokenizers = {}
+_count_cache = LRUCache(maxsize=256)
+
+
+def estimate_tokens(text):
+    # Offline approximation of BPE token counts: one token per punctuation mark and line break plus
+    # one per started 6 characters of each word. Tends to err on the high side for English text.
+    if not text:
+        return 0
+    return text.count("\n") + sum(1 + (len(piece) - 1) // 6 for piece in _WORD_RE.findall(text))
+
+
+def register_tokenizer(name, count_fn):
+    # count_fn takes a string and returns its token count
+    _tokenizers[name] = count_fn
+    _count_cache.clear()
+
+
+def _tiktoken_counter(encoding_name):
+    # tiktoken (and its encoding files) are only loaded the first time this tokenizer is used
+    encoding = None
+
+    def count(text):
+        nonlocal encoding
+        if encoding is None:
+            import tiktoken
+            encoding = tiktoken.get_encoding(encoding_name)
+        return len(encoding.encode(text, disallowed_special=()))
+    return count
+
+
+register_tokenizer("estimate", estimate_tokens)
+if importlib.util.find_spec("tiktoken") is not None:
+    register_tokenizer("tiktoken (cl100k_base)", _tiktoken_counter("cl100k_base"))
+
+
+def tokenizer_names():
+    return list(_tokenizers)
+
+
+def count_tokens(text, tokenizer="estimate"):
+    count_fn = _tokenizers.get(tokenizer)
+    if count_fn is None:
+        logger.error("Unknown tokenizer: %s, falling back to estimate", tokenizer)
+        tokenizer, count_fn = "estimate", estimate_tokens
+    # System prompts and schemas repeat across calls, so their counts are memoized
+    key = (tokenizer, text)
+    count = _count_cache.get(key)
+    if count is None:
+        count = _count_cache.put(key, count_fn(text))
+    return count